@@ -1,23 +1,36 @@
 """All account apis will be defined here."""
 
 from __future__ import absolute_import
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.conf.urls import url
 from django.db import transaction
+from django.http import HttpResponse
 from tastypie.authentication import Authentication
 from tastypie.authorization import Authorization
 from tastypie.resources import ModelResource
+from tastypie.exceptions import ImmediateHttpResponse
 from tastypie.http import HttpUnauthorized
 from tastypie.utils import trailing_slash
 from tastypie.models import ApiKey
 from tastypie import fields
 from .signals import * # noqa
 from .authentication import ApiKeyAuthenticationExt
+from .hashing import HashingBusy, check_password, make_password
+from .tokens import ACCESS_TOKEN_ENABLED, ACCESS_TOKEN_SCHEME, get_generation, issue_token, revoke_token, \
+    revoke_user_tokens
 from .validation import UserProfileValidation
+from ..commons.constants import ERRORS_CODE
 from ..commons.custom_exception import CustomBadRequest
 from ..commons.multipart_resource import MultipartResource
+from ..commons.throttle import EndpointThrottleMixin, SlidingWindowThrottle
+import json
 import os
 
+# Backend recorded in the session of users signed in with their checked password
+PASSWORD_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+# Seconds clients wait before retrying a sign in or sign up turned away by a full hashing pool
+BUSY_RETRY_AFTER = 1
+
 
 class InternalUserResource(ModelResource):
     """Internal user resource class."""
@@ -84,7 +97,7 @@ class InternalUserProfileResource(ModelResource):
         }
 
 
-class UserProfileResource(MultipartResource, ModelResource):
+class UserProfileResource(EndpointThrottleMixin, MultipartResource, ModelResource):
     """User profile resource models."""
 
     user = fields.ToOneField(InternalUserResource, attribute='user', null=True)
@@ -98,9 +111,11 @@ class UserProfileResource(MultipartResource, ModelResource):
 
         queryset = UserProfile.objects.prefetch_related('user').prefetch_related('image') # noqa
         resource_name = 'userprofile'
+        excludes = ['feed_secret']
         always_return_data = True
         authentication = ApiKeyAuthenticationExt()
         authorization = Authorization()
+        throttle = SlidingWindowThrottle('userprofile')
         validation = UserProfileValidation()
 
     def hydrate(self, bundle):
@@ -187,6 +202,8 @@ class AuthenticationResource(ModelResource):
                 self.wrap_view('sign_up_by_email'), name="api_sign_up_by_email"),
             url(r"^(?P<resource_name>%s)/sign_out%s$" % (self._meta.resource_name, trailing_slash()),
                 self.wrap_view('sign_out'), name="api_sign_out"),
+            url(r"^(?P<resource_name>%s)/token%s$" % (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('refresh_token'), name="api_refresh_token"),
         ]
 
     def sign_in(self, request, **kwargs):
@@ -210,8 +227,9 @@ class AuthenticationResource(ModelResource):
         user = User.objects.filter(email=email).first() # noqa
 
         if user:
-            if user.check_password(password):
-                user = authenticate(username=email, password=password)
+            if self.check_password(user, password):
+                # Checked above, authenticate() would hash the password a second time
+                user.backend = PASSWORD_BACKEND
                 login(request, user)
                 apikey = ApiKey.objects.filter(user=user).first()
                 return self.create_auth_response(request=request, user=user, api_key=apikey.key, is_new=True)
@@ -241,23 +259,48 @@ class AuthenticationResource(ModelResource):
             raise CustomBadRequest(error_type='DUPLICATE_VALUE', field='email', obj='email')
         else:
             try:
+                if not email:
+                    raise ValueError('The given username must be set')
+                # Hashed once, outside the transaction, the new user is signed in without authenticate()
+                user = User(username=email, email=User.objects.normalize_email(email), # noqa
+                            first_name=first_name, last_name=last_name)
+                user.password = self.make_password(password)
                 with transaction.atomic():
-
-                    User.objects.create_user(username=email, email=email, password=password, first_name=first_name, last_name=last_name) # noqa
-                    user = authenticate(username=email, password=password)
-
+                    user.save()
+                    user.backend = PASSWORD_BACKEND
                     login(request, user)
 
-                    if user is not None:
-                        self.create_userprofile(user.id)
-                        apikey = ApiKey.objects.filter(user=user).first()
-                        self.upload_user_image(request, **kwargs)
-                        return self.create_auth_response(request=request, user=user, api_key=apikey.key, is_new=True)
-                    else:
-                        raise CustomBadRequest(error_type='UNKNOWN_ERROR', error_message='Cant sign up by this email.')
+                    self.create_userprofile(user.id)
+                    apikey = ApiKey.objects.filter(user=user).first()
+                    self.upload_user_image(request, **kwargs)
+                    return self.create_auth_response(request=request, user=user, api_key=apikey.key, is_new=True)
             except ValueError as e:
                 raise CustomBadRequest(error_type='UNKNOWN_ERROR', error_message=str(e))
 
+    def check_password(self, user, password):
+        """Check an user's password on the hashing pool, answer 503 when it's full."""
+        try:
+            return check_password(user, password)
+        except HashingBusy:
+            raise ImmediateHttpResponse(response=self.create_busy_response())
+
+    def make_password(self, password):
+        """Hash a password on the hashing pool, answer 503 when it's full."""
+        try:
+            return make_password(password)
+        except HashingBusy:
+            raise ImmediateHttpResponse(response=self.create_busy_response())
+
+    def create_busy_response(self):
+        """Generate the response turning a sign in or sign up away while the hashing pool is full."""
+        error = ERRORS_CODE['BUSY']
+        response = HttpResponse(json.dumps({'error': {
+            'code': error['code'],
+            'message': error['message'].format(obj=BUSY_RETRY_AFTER)
+        }}), content_type='application/json', status=error['code'])
+        response['Retry-After'] = BUSY_RETRY_AFTER
+        return response
+
     def upload_user_image(self, request, **kwargs):
         """Upload user image handler."""
         if 'original' in request.FILES:
@@ -268,17 +311,50 @@ class AuthenticationResource(ModelResource):
                 UserProfile.objects.filter(user__id=request.user.id).update(image=userimage) # noqa
 
     def sign_out(self, request, **kwargs):
-        """Sign out handler."""
+        """Sign out handler, revokes every access token of the user."""
         self.is_authenticated(request)
         self.method_check(request, allowed=['post', 'get'])
 
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        revoked = authorization.startswith(ACCESS_TOKEN_SCHEME) and \
+            revoke_token(authorization[len(ACCESS_TOKEN_SCHEME):])
+
         if request.user and request.user.is_authenticated():
+            revoke_user_tokens(request.user.id)
             logout(request)
 
+            return self.create_response(request, {'success': True})
+        elif revoked:
             return self.create_response(request, {'success': True})
         else:
             return self.create_response(request, {'success': False}, HttpUnauthorized)
 
+    def refresh_token(self, request, **kwargs):
+        """
+        Hand out a new access token to a client authenticated by its API key or a still valid token.
+
+        The user is read again from the database, tokens carry no active flag
+        and may hold a stale profile.
+        """
+        self.method_check(request, allowed=['post'])
+        if not ACCESS_TOKEN_ENABLED:
+            raise CustomBadRequest(error_type='INVALID_OPERATOR', error_message='Access tokens are disabled')
+        if ApiKeyAuthenticationExt().is_authenticated(request) is not True or not request.user.is_authenticated():
+            raise CustomBadRequest(error_type='UNAUTHORIZED')
+
+        # The generation is read before the user, a deactivation committed after the query still revokes the token
+        generation = get_generation(request.user.id)
+        user = User.objects.filter(id=request.user.id, is_active=True) \
+            .values_list('is_superuser', 'userprofile__id').first() # noqa
+        if user is None:
+            raise CustomBadRequest(error_type='UNAUTHORIZED')
+        is_superuser, profile_id = user
+        if profile_id is None:
+            raise CustomBadRequest(error_type='UNAUTHORIZED', error_message='The user has no profile')
+
+        access_token, expires_at = issue_token(request.user.id, profile_id, is_superuser, generation)
+        return self.create_response(request, {'access_token': access_token, 'access_token_expires_at': expires_at})
+
     def create_auth_response(self, request, user, api_key, is_new=False):
         """Genetate response data for authentication process."""
         userprofile = UserProfile.objects.get(id=user.userprofile.id) # noqa
@@ -287,6 +363,10 @@ class AuthenticationResource(ModelResource):
         bundle = resource_instance.full_hydrate(resource_instance.build_bundle(obj=userprofile, request=request))
         bundle.data['user']['api_key'] = api_key
         bundle.data['user']['is_new'] = is_new
+        if ACCESS_TOKEN_ENABLED:
+            access_token, expires_at = issue_token(user.id, userprofile.id, user.is_superuser)
+            bundle.data['user']['access_token'] = access_token
+            bundle.data['user']['access_token_expires_at'] = expires_at
 
         return self.create_response(request, bundle)
 
@@ -1,7 +1,45 @@
 """Authentication common methods."""
-from tastypie.http import HttpUnauthorized
+from __future__ import absolute_import
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject, empty
 from tastypie.authentication import ApiKeyAuthentication
-from tastypie.models import ApiKey
+from .cache import get_credentials
+from .models import UserProfile
+from .tokens import ACCESS_TOKEN_SCHEME, get_token_credentials
+
+
+class CredentialsObject(SimpleLazyObject):
+    """Model instance loaded on first use, but for the attributes the credentials already hold."""
+
+    def __init__(self, func, **known):
+        """Initialize with the loading function and the known attributes."""
+        self.__dict__['_known'] = known
+        super(CredentialsObject, self).__init__(func)
+
+    def __getattr__(self, name):
+        """Get a known attribute without loading, once loaded the instance's own."""
+        if self._wrapped is empty and name in self._known:
+            return self._known[name]
+        return super(CredentialsObject, self).__getattr__(name)
+
+
+def credentials_user(credentials):
+    """
+    Build the user of cached API key credentials, its profile attached, without querying.
+
+    The ids, the active and superuser flags and ``is_authenticated()`` come from
+    the credentials, any other attribute loads the user or its profile, saving
+    them is safe.
+    """
+    user_id, profile_id, is_active, is_superuser = credentials
+    known = {
+        'id': user_id, 'pk': user_id, 'is_active': is_active, 'is_superuser': is_superuser,
+        'is_authenticated': lambda: True, 'is_anonymous': lambda: False,
+    }
+    if profile_id is not None:
+        known['userprofile'] = CredentialsObject(lambda: UserProfile.objects.get(id=profile_id),
+                                                 id=profile_id, pk=profile_id, user_id=user_id)
+    return CredentialsObject(lambda: User.objects.select_related('userprofile').get(id=user_id), **known)
 
 
 class ApiKeyAuthenticationExt(ApiKeyAuthentication):
@@ -22,7 +60,12 @@ class ApiKeyAuthenticationExt(ApiKeyAuthentication):
         return api_key
 
     def is_authenticated(self, request, **kwargs):
-        """Verify authentication."""
+        """
+        Verify authentication.
+
+        API keys are looked up in ``backend.account.cache``, ``Bearer`` access
+        tokens are verified by ``backend.account.tokens`` without a lookup.
+        """
         try:
             api_key = self.extract_credentials(request)
         except ValueError:
@@ -32,34 +75,27 @@ class ApiKeyAuthenticationExt(ApiKeyAuthentication):
         if not api_key and request.method == "GET":
             return True
         elif api_key and not request.user.is_authenticated():
-            try:
-                apikey = ApiKey.objects \
-                    .filter(key__iexact=api_key) \
-                    .prefetch_related('user') \
-                    .prefetch_related('user__userprofile') \
-                    .first()
-
-                user = apikey.user
-            except (ApiKey.DoesNotExist, ApiKey.MultipleObjectReturned):
+            if api_key.startswith(ACCESS_TOKEN_SCHEME):
+                credentials = get_token_credentials(api_key)
+            else:
+                credentials = get_credentials(api_key)
+            if credentials is None:
                 return self._unauthorized()
 
+            user = credentials_user(credentials)
             if not self.check_active(user):
                 return False
 
-            key_auth_check = self.get_key(user, api_key)
-            if key_auth_check and not isinstance(key_auth_check, HttpUnauthorized):
-                request.user = user
-
-            return key_auth_check
+            request.user = user
+            return True
         elif api_key and request.user.is_authenticated():
             return True
         else:
             return self._unauthorized()
 
     def get_identifier(self, request):
-        """Get identifier."""
-        if request.method == "GET":
-            return True
-
-        api_key = self.extract_credentials(request)
-        return api_key or 'nouser'
+        """Get the identifier throttles count requests by, the user once authenticated, the client address otherwise."""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated():
+            return 'user_%s' % user.id
+        return 'addr_%s' % request.META.get('REMOTE_ADDR', 'noaddr')
@@ -0,0 +1,118 @@
+"""API key credentials cache."""
+from __future__ import absolute_import
+import time
+from django.conf import settings
+from django.core.cache import cache
+from ..commons.lru import LRUCache
+from .models import ApiKeyDigest, api_key_digest
+
+# Seconds credentials stay in the shared cache, saves and deletes of keys, users and profiles drop them earlier
+CREDENTIALS_TIMEOUT = getattr(settings, 'API_KEY_CACHE_TIMEOUT', 300)
+# Credentials kept by each process, and seconds they are reused: other processes' invalidations don't reach them
+CREDENTIALS_LOCAL_SIZE = getattr(settings, 'API_KEY_LOCAL_CACHE_SIZE', 4096)
+CREDENTIALS_LOCAL_TTL = getattr(settings, 'API_KEY_LOCAL_CACHE_TTL', 5)
+# ``(user id, profile id, active, superuser)`` of a key
+CREDENTIALS_FIELDS = ('user_id', 'user__userprofile__id', 'user__is_active', 'user__is_superuser')
+
+# Seconds unknown keys stay in the shared cache, creating a key drops its entry earlier
+CREDENTIALS_UNKNOWN_TIMEOUT = getattr(settings, 'API_KEY_UNKNOWN_CACHE_TIMEOUT', 60)
+
+# Seconds the credentials generation of an user is kept, an evicted one only costs a database lookup
+CREDENTIALS_GENERATION_TIMEOUT = 24 * 3600
+# Cache key of the generation of all users' cached credentials, increased by every invalidation
+CREDENTIALS_GENERATION_KEY = 'auth:apikey:generation'
+
+local_credentials = LRUCache(maxsize=CREDENTIALS_LOCAL_SIZE, ttl=CREDENTIALS_LOCAL_TTL)
+
+
+def credentials_key(digest):
+    """Cache key of the credentials of an API key."""
+    return 'auth:apikey:%s' % digest
+
+
+def user_generation_key(user_id):
+    """Cache key of the generation of an user's cached credentials."""
+    return 'auth:apikey:user:%s:generation' % user_id
+
+
+def get_generation(key):
+    """
+    Get a generation of cached credentials.
+
+    It starts from the current time so that an evicted generation never comes
+    back with a value cached credentials were already stored with.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), CREDENTIALS_GENERATION_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key):
+    """Increase a generation of cached credentials."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), CREDENTIALS_GENERATION_TIMEOUT)
+
+
+def load_credentials(digest):
+    """
+    Load the credentials of an API key digest with a single query, and cache them.
+
+    The user isn't known before the query, so its generation is read after it:
+    the entry is only stored when no invalidation happened in between, the
+    generation of all users is the same before and after. Unknown digests are
+    cached for ``CREDENTIALS_UNKNOWN_TIMEOUT`` with the generation of all users,
+    any invalidation drops them.
+    """
+    generation = get_generation(CREDENTIALS_GENERATION_KEY)
+    credentials = ApiKeyDigest.objects.filter(digest=digest).values_list(*CREDENTIALS_FIELDS).first()
+    if credentials is None:
+        cache.set(credentials_key(digest), (None, generation), CREDENTIALS_UNKNOWN_TIMEOUT)
+        return None
+    user_generation = get_generation(user_generation_key(credentials[0]))
+    if cache.get(CREDENTIALS_GENERATION_KEY) == generation:
+        cache.set(credentials_key(digest), (credentials, user_generation), CREDENTIALS_TIMEOUT)
+    return credentials
+
+
+def get_credentials(api_key):
+    """
+    Get the ``CREDENTIALS_FIELDS`` of an API key, None for unknown keys.
+
+    Looked up in this process first, then in the shared cache, then in the
+    database by the digest of the key, keys themselves never end up in cache keys.
+    Shared entries hold the generation of their user: credentials cached before
+    an invalidation are never used after it.
+    """
+    digest = api_key_digest(api_key)
+    credentials = local_credentials.get(digest)
+    if credentials is not None:
+        return credentials
+
+    entry = cache.get(credentials_key(digest))
+    if entry is not None and entry[0] is None:
+        if entry[1] == get_generation(CREDENTIALS_GENERATION_KEY):
+            return None
+    elif entry is not None and entry[1] == get_generation(user_generation_key(entry[0][0])):
+        credentials = entry[0]
+    if credentials is None:
+        credentials = load_credentials(digest)
+        if credentials is None:
+            return None
+
+    credentials = tuple(credentials)
+    local_credentials.set(digest, credentials)
+    return credentials
+
+
+def invalidate_user(user_id, api_key=None):
+    """Drop the cached credentials of an user's API keys, and of ``api_key``."""
+    # All users first: credentials loaded meanwhile are either not stored or stored with the former user generation
+    bump_generation(CREDENTIALS_GENERATION_KEY)
+    bump_generation(user_generation_key(user_id))
+    if api_key:
+        cache.delete(credentials_key(api_key_digest(api_key)))
+    local_credentials.delete_matching(lambda credentials: credentials[0] == user_id)
@@ -0,0 +1,104 @@
+"""Password hashing pool."""
+from __future__ import absolute_import
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+logger = logging.getLogger(__name__)
+
+# Threads hashing passwords, PBKDF2 releases the GIL so one per core keeps every core busy
+HASHING_WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+# Hashes running or queued past which sign ins and sign ups are turned away
+HASHING_MAX_PENDING = getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', None) or HASHING_WORKERS * 4
+# Seconds a hash may wait in the queue before it is logged
+HASHING_SLOW_WAIT = 0.5
+
+
+class HashingBusy(Exception):
+    """More hashes are pending than the pool takes."""
+
+
+class HashingPool(object):
+    """
+    Bounded pool running password hashes off the request threads.
+
+    Callers still wait for their hash, but at most ``max_pending`` of them:
+    a login storm gets turned away instead of holding every request thread.
+    """
+
+    def __init__(self, workers=HASHING_WORKERS, max_pending=HASHING_MAX_PENDING):
+        """Initialize, threads are started on the first hash."""
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.counters = {'hashed': 0, 'rejected': 0, 'peak_pending': 0,
+                         'wait_total': 0.0, 'wait_max': 0.0, 'hash_total': 0.0, 'hash_max': 0.0}
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and wait for its result, raise ``HashingBusy`` when the pool is full."""
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise HashingBusy()
+            self.pending += 1
+            self.counters['peak_pending'] = max(self.counters['peak_pending'], self.pending)
+            pending = self.pending
+        try:
+            return self.executor.submit(self.timed, func, args, time.time(), pending).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def timed(self, func, args, submitted_at, pending):
+        """Run a hash on a pool thread, recording how long it waited and ran."""
+        started_at = time.time()
+        try:
+            return func(*args)
+        finally:
+            wait, elapsed = started_at - submitted_at, time.time() - started_at
+            with self.lock:
+                self.counters['hashed'] += 1
+                self.counters['wait_total'] += wait
+                self.counters['wait_max'] = max(self.counters['wait_max'], wait)
+                self.counters['hash_total'] += elapsed
+                self.counters['hash_max'] = max(self.counters['hash_max'], elapsed)
+            if wait > HASHING_SLOW_WAIT:
+                logger.warning('Password hash waited %.3fs behind %s pending hashes', wait, pending - 1)
+
+    def stats(self):
+        """Get this process' queue depth and latencies, in seconds."""
+        with self.lock:
+            stats = dict(self.counters, pending=self.pending, workers=self.workers, max_pending=self.max_pending)
+        hashed = stats['hashed']
+        stats['wait_mean'] = stats.pop('wait_total') / hashed if hashed else 0.0
+        stats['hash_mean'] = stats.pop('hash_total') / hashed if hashed else 0.0
+        return stats
+
+
+hashing_pool = HashingPool()
+
+
+def make_password(password):
+    """``hashers.make_password`` run on the pool."""
+    return hashing_pool.run(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """
+    ``User.check_password`` with the hash run on the pool.
+
+    A password stored with an outdated hasher is rehashed, which only
+    happens on the first login after the hasher changes.
+    """
+    outdated = []
+    is_correct = hashing_pool.run(hashers.check_password, password, user.password, outdated.append)
+    if outdated:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,66 @@
+"""Benchmark the password checks of sign in."""
+from __future__ import absolute_import
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ... import hashing
+
+
+def double_check_password(user, password):
+    """Sign in before the single hash path: ``user.check_password`` then ``authenticate()`` checking it again."""
+    return hashers.check_password(password, user.password) and hashers.check_password(password, user.password)
+
+
+class Command(BaseCommand):
+    """Time concurrent sign in password checks, hashed twice in the request threads and once on the hashing pool."""
+
+    help = 'Benchmark sign in password hashing, in logins per second per core.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--logins', type=int, default=200,
+                            help='Logins per measure.')
+        parser.add_argument('--clients', type=int, default=16,
+                            help='Concurrent logins, like request threads.')
+
+    def handle(self, *args, **options):
+        """Check both paths accept the password and refuse a wrong one, then time them."""
+        logins, clients = options['logins'], options['clients']
+        cores = os.cpu_count() or 1
+        user = User(username='benchmark@example.com', password=hashers.make_password('benchmark'))
+
+        for check in (double_check_password, hashing.check_password):
+            if not check(user, 'benchmark') or check(user, 'wrong'):
+                raise CommandError('%s disagrees with check_password' % check.__name__)
+
+        # Sized to the clients so that the pool measures hashing, not turning logins away, their waits are expected
+        hashing.logger.setLevel(logging.ERROR)
+        hashing.hashing_pool = hashing.HashingPool(max_pending=max(clients, hashing.HASHING_MAX_PENDING))
+        measures = [
+            ('hashed twice, request threads', double_check_password),
+            ('hashed once, hashing pool', hashing.check_password),
+        ]
+
+        self.stdout.write('%d logins by %d clients, %d cores, %d hashing threads, %s' % (
+            logins, clients, cores, hashing.hashing_pool.workers, hashers.get_hasher().algorithm))
+        self.stdout.write('%-32s %10s %12s %14s %10s' % (
+            'implementation', 'logins/s', 'logins/s/core', 'cpu ms/login', 'speedup'))
+        baseline = None
+        for name, check in measures:
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                wall, cpu = time.time(), time.process_time()
+                list(executor.map(lambda _: check(user, 'benchmark'), range(logins)))
+                wall, cpu = time.time() - wall, time.process_time() - cpu
+            baseline = baseline or wall
+            self.stdout.write('%-32s %10.1f %12.1f %14.2f %9.1fx' % (
+                name, logins / wall, logins / wall / cores, cpu / logins * 1e3, baseline / wall))
+
+        stats = hashing.hashing_pool.stats()
+        self.stdout.write('hashing pool: %d hashed, peak %d pending, wait mean %.1fms max %.1fms, '
+                          'hash mean %.1fms max %.1fms' % (
+                              stats['hashed'], stats['peak_pending'], stats['wait_mean'] * 1e3,
+                              stats['wait_max'] * 1e3, stats['hash_mean'] * 1e3, stats['hash_max'] * 1e3))
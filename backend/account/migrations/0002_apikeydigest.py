@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+# Keys digested per transaction
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_digests(apps, schema_editor):
+    """
+    Digest the existing API keys, one short transaction per batch of keys in id order.
+
+    Mirrors ``api_key_digest``. Keys digested meanwhile by the new code are skipped.
+    """
+    ApiKey = apps.get_model('tastypie', 'ApiKey')
+    ApiKeyDigest = apps.get_model('account', 'ApiKeyDigest')
+    db_alias = schema_editor.connection.alias
+
+    digested = ApiKeyDigest.objects.using(db_alias).values('api_key_id')
+    pending = ApiKey.objects.using(db_alias).exclude(key='').exclude(id__in=digested).order_by('id')
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            keys = list(pending.filter(id__gt=last_id).values_list('id', 'user_id', 'key')[:BACKFILL_BATCH_SIZE])
+            ApiKeyDigest.objects.using(db_alias).bulk_create([
+                ApiKeyDigest(api_key_id=key_id, user_id=user_id,
+                             digest=hashlib.sha256(key.strip().lower().encode('utf-8')).hexdigest())
+                for key_id, user_id, key in keys
+            ])
+        if len(keys) < BACKFILL_BATCH_SIZE:
+            return
+        last_id = keys[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # The backfill commits batch by batch
+    atomic = False
+
+    dependencies = [
+        ('tastypie', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiKeyDigest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(editable=False, max_length=64)),
+                ('api_key', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='digest', to='tastypie.ApiKey')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_key_digests', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        # Authentication probes it with the digest of the presented key. A plain unique index, unique=True
+        # would add a varchar_pattern_ops one nothing uses
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX account_apikeydigest_digest_uniq ON account_apikeydigest (digest)'],
+            ['DROP INDEX IF EXISTS account_apikeydigest_digest_uniq'],
+        ),
+        migrations.RunPython(backfill_digests, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,12 @@
 """Define all account models."""
 
 from __future__ import absolute_import
+import hashlib
 from django.db import models
 from django.conf import settings
 from imagekit.models import ImageSpecField, ProcessedImageField
 from imagekit.processors import SmartResize
+from tastypie.models import ApiKey
 from ..commons.cache import img_url_cache
 import uuid
 import os
@@ -20,6 +22,20 @@ def get_unique_file_path(_, filename):
     return os.path.join(settings.FILE_UPLOAD_PREFIX_FOLDER_USER, filename)
 
 
+def normalize_api_key(api_key):
+    """Strip and lower an API key, keys are hex digests so their case carries nothing."""
+    return (api_key or '').strip().lower()
+
+
+def api_key_digest(api_key):
+    """
+    Fixed length digest of a normalized API key, authentication looks keys up by it.
+
+    Keys are random, an unsalted digest is as hard to reverse and keeps lookups a single index probe.
+    """
+    return hashlib.sha256(normalize_api_key(api_key).encode('utf-8')).hexdigest()
+
+
 class UserImage(models.Model):
     """User image models."""
 
@@ -72,6 +88,8 @@ class UserProfile(models.Model):
     image = models.ForeignKey(UserImage, blank=True, null=True)
     first_name = models.CharField(max_length=255, null=True, blank=True)
     last_name = models.CharField(max_length=255, null=True, blank=True)
+    # Secret of the user's iCalendar feed url, replaced to revoke the urls handed out, see ``backend.task.feed``
+    feed_secret = models.CharField(max_length=32, default='', blank=True, editable=False)
 
     @property
     def full_name(self):
@@ -81,3 +99,16 @@ class UserProfile(models.Model):
     def __str__(self):
         """Default string."""
         return self.user.email if self.user else ''
+
+
+class ApiKeyDigest(models.Model):
+    """Digest of an user's API key, kept in step with the ``ApiKey`` by ``backend.account.signals``."""
+
+    api_key = models.OneToOneField(ApiKey, related_name='digest')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='api_key_digests')
+    # Unique, see migration ``0002_apikeydigest``
+    digest = models.CharField(max_length=64, editable=False)
+
+    def __str__(self):
+        """Default string."""
+        return self.digest
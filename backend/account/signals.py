@@ -1,10 +1,12 @@
 """All image handlers."""
 
 from django.dispatch import receiver
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from tastypie.models import create_api_key
-from .models import UserImage, UserProfile
+from tastypie.models import ApiKey, create_api_key
+from .cache import invalidate_user
+from .models import ApiKeyDigest, UserImage, UserProfile, api_key_digest
+from .tokens import revoke_user_tokens
 from ..commons.utils import delete_obsolete_img
 
 models.signals.post_save.connect(create_api_key, sender=User)
@@ -43,3 +45,44 @@ def delete_userprofile(sender, **kwargs):
     except ValueError as e:
         print('delete_userprofile %s' % e)
         pass
+
+
+@receiver(models.signals.post_save, sender=ApiKey)
+def store_api_key_digest(sender, **kwargs):
+    """Store the digest of a saved API key, authentication only looks keys up by it."""
+    apikey = kwargs["instance"]
+    if kwargs.get('raw', False) is False:
+        ApiKeyDigest.objects.update_or_create(api_key_id=apikey.id, defaults={
+            'user_id': apikey.user_id,
+            'digest': api_key_digest(apikey.key),
+        })
+
+
+@receiver(models.signals.post_save, sender=ApiKey)
+@receiver(models.signals.post_delete, sender=ApiKey)
+def invalidate_api_key_credentials(sender, **kwargs):
+    """Drop the cached credentials of a saved or deleted API key, once the change is committed."""
+    apikey = kwargs["instance"]
+    transaction.on_commit(lambda: invalidate_user(apikey.user_id, apikey.key))
+
+
+@receiver(models.signals.post_save, sender=User)
+@receiver(models.signals.post_delete, sender=User)
+@receiver(models.signals.post_save, sender=UserProfile)
+@receiver(models.signals.post_delete, sender=UserProfile)
+def invalidate_user_credentials(sender, **kwargs):
+    """Drop the cached credentials of a saved or deleted user, they hold its active flag and profile id."""
+    instance = kwargs["instance"]
+    user_id = instance.id if sender is User else instance.user_id
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver(models.signals.post_save, sender=User)
+@receiver(models.signals.post_delete, sender=User)
+def revoke_user_access_tokens(sender, **kwargs):
+    """Revoke the access tokens of a deactivated or deleted user, once the change is committed."""
+    user = kwargs["instance"]
+    if kwargs["signal"] is models.signals.post_delete or not user.is_active:
+        user_id = user.id
+        transaction.on_commit(lambda: revoke_user_tokens(user_id))
@@ -0,0 +1,37 @@
+"""API key authentication tests."""
+from __future__ import absolute_import
+from test_plus.test import TestCase
+from ..authentication import credentials_user
+from ..models import UserProfile
+
+
+class CredentialsUserTestCase(TestCase):
+    """The user of cached credentials."""
+
+    def setUp(self):
+        """An user with a profile, and the user of its credentials."""
+        self.user = self.make_user()
+        self.profile = UserProfile.objects.create(user=self.user, first_name='First', last_name='Last')
+        self.credentials_user = credentials_user((self.user.id, self.profile.id, True, False))
+
+    def test_credentials_attributes(self):
+        """The attributes of the credentials need no query."""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.credentials_user.id, self.user.id)
+            self.assertEqual(self.credentials_user.userprofile.id, self.profile.id)
+            self.assertTrue(self.credentials_user.is_active)
+            self.assertFalse(self.credentials_user.is_superuser)
+            self.assertTrue(self.credentials_user.is_authenticated())
+
+    def test_save(self):
+        """Saving the user or its profile keeps the fields the credentials don't hold."""
+        self.credentials_user.email = 'changed@example.com'
+        self.credentials_user.save()
+        self.credentials_user.userprofile.first_name = 'Changed'
+        self.credentials_user.userprofile.save()
+        user = type(self.user).objects.get(id=self.user.id)
+        self.assertEqual(user.email, 'changed@example.com')
+        self.assertEqual(user.username, self.user.username)
+        self.assertEqual(user.password, self.user.password)
+        profile = UserProfile.objects.get(id=self.profile.id)
+        self.assertEqual((profile.first_name, profile.last_name, profile.user_id), ('Changed', 'Last', self.user.id))
@@ -0,0 +1,46 @@
+"""API key credentials cache tests."""
+from __future__ import absolute_import
+from django.core.cache import cache
+from test_plus.test import TestCase
+from tastypie.models import ApiKey
+from .. import signals  # noqa, stores the digests of API keys and invalidates their cached credentials
+from ..cache import get_credentials, invalidate_user, local_credentials
+from ..models import UserProfile
+
+
+class CredentialsCacheTestCase(TestCase):
+    """Credentials of API keys, looked up by digest."""
+
+    def setUp(self):
+        """An user with a profile, and its API key."""
+        cache.clear()
+        local_credentials.clear()
+        self.user = self.make_user()
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.api_key = ApiKey.objects.get(user=self.user).key
+
+    def get_credentials(self, api_key, queries):
+        """Get the credentials of a key from the shared cache, counting the queries."""
+        local_credentials.clear()
+        with self.assertNumQueries(queries):
+            return get_credentials(api_key)
+
+    def test_single_query(self):
+        """A miss loads the credentials with a single query, a hit runs none."""
+        credentials = (self.user.id, self.profile.id, True, False)
+        self.assertEqual(self.get_credentials(self.api_key, 1), credentials)
+        self.assertEqual(self.get_credentials(self.api_key, 0), credentials)
+        invalidate_user(self.user.id)
+        self.assertEqual(self.get_credentials(self.api_key, 1), credentials)
+
+    def test_unknown_keys(self):
+        """Unknown keys are cached until any invalidation, creating a key included."""
+        self.assertIsNone(self.get_credentials('unknown', 1))
+        self.assertIsNone(self.get_credentials('unknown', 0))
+        user = self.make_user('other')
+        api_key = ApiKey.objects.get(user=user)
+        api_key.key = 'unknown'
+        api_key.save()
+        # As the key's commit would
+        invalidate_user(user.id, api_key.key)
+        self.assertEqual(self.get_credentials('unknown', 1), (user.id, None, True, False))
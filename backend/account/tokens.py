@@ -0,0 +1,113 @@
+"""Signed access tokens."""
+from __future__ import absolute_import
+import time
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from ..commons.lru import LRUCache
+
+# Sign in and sign up hand out access tokens, and authentication accepts them, next to API keys
+ACCESS_TOKEN_ENABLED = getattr(settings, 'ACCESS_TOKEN_ENABLED', False)
+# Seconds an access token is valid
+ACCESS_TOKEN_LIFETIME = getattr(settings, 'ACCESS_TOKEN_LIFETIME', 900)
+# Token generations kept by each process, and seconds they are reused: revocations reach other processes after that
+REVOCATIONS_LOCAL_SIZE = 4096
+REVOCATIONS_LOCAL_TTL = getattr(settings, 'ACCESS_TOKEN_REVOCATION_LOCAL_TTL', 5)
+ACCESS_TOKEN_SALT = 'backend.account.tokens'
+# Prefix of the Authorization header telling access tokens from API keys
+ACCESS_TOKEN_SCHEME = 'Bearer '
+# Seconds the token generation of an user is kept, an expired one only costs clients a refresh
+TOKEN_GENERATION_TIMEOUT = 24 * 3600
+
+local_generations = LRUCache(maxsize=REVOCATIONS_LOCAL_SIZE, ttl=REVOCATIONS_LOCAL_TTL)
+
+
+def generation_key(user_id):
+    """Cache key of the generation of an user's tokens."""
+    return 'auth:token:generation:%s' % user_id
+
+
+def get_generation(user_id):
+    """
+    Get the generation of an user's tokens, tokens of an older one are refused.
+
+    It starts from the current time so that an expired generation never
+    comes back with a value tokens were issued with. Reused by each process
+    for ``REVOCATIONS_LOCAL_TTL`` seconds.
+    """
+    generation = local_generations.get(user_id)
+    if generation is None:
+        key = generation_key(user_id)
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, int(time.time() * 1000), TOKEN_GENERATION_TIMEOUT)
+            generation = cache.get(key)
+        local_generations.set(user_id, generation)
+    return generation
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token of an user."""
+    try:
+        cache.incr(generation_key(user_id))
+    except ValueError:
+        cache.set(generation_key(user_id), int(time.time() * 1000), TOKEN_GENERATION_TIMEOUT)
+    local_generations.delete(user_id)
+
+
+def issue_token(user_id, profile_id, is_superuser=False, generation=None, lifetime=ACCESS_TOKEN_LIFETIME):
+    """
+    Get a new access token of an user, and the unix time it expires at.
+
+    ``generation`` is the user's current one by default, callers checking
+    the user first read it before: a revocation meanwhile refuses the token.
+    """
+    if generation is None:
+        generation = get_generation(user_id)
+    expires_at = int(time.time()) + lifetime
+    token = signing.dumps([user_id, profile_id, bool(is_superuser), expires_at, uuid.uuid4().hex, generation],
+                          salt=ACCESS_TOKEN_SALT)
+    return token, expires_at
+
+
+def read_token(token):
+    """
+    Get the ``[user id, profile id, superuser, expires at, token id, generation]`` of a valid token, None otherwise.
+
+    The signature and the expiry are checked in process, the generation in
+    the cache at most once per ``REVOCATIONS_LOCAL_TTL`` seconds.
+    """
+    try:
+        payload = signing.loads(token, salt=ACCESS_TOKEN_SALT)
+        user_id, _, _, expires_at, _, generation = payload
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if expires_at <= time.time() or generation != get_generation(user_id):
+        return None
+    return payload
+
+
+def revoke_token(token):
+    """Revoke every token of the user of a valid token, return whether it was valid."""
+    payload = read_token(token)
+    if payload is None:
+        return False
+    revoke_user_tokens(payload[0])
+    return True
+
+
+def get_token_credentials(authorization):
+    """
+    Get the ``(user id, profile id, active, superuser)`` of the access token of an Authorization header.
+
+    None when the header holds no valid token or tokens are disabled. Signing
+    out and deactivating an user revoke its tokens, see ``revoke_user_tokens``.
+    """
+    if not ACCESS_TOKEN_ENABLED or not authorization.startswith(ACCESS_TOKEN_SCHEME):
+        return None
+    payload = read_token(authorization[len(ACCESS_TOKEN_SCHEME):])
+    if payload is None:
+        return None
+    user_id, profile_id, is_superuser = payload[:3]
+    return user_id, profile_id, True, is_superuser
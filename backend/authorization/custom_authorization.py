@@ -13,11 +13,11 @@ class UserObjectsOnlyAuthorization(Authorization):
 
     def update_detail(self, object_list, bundle):
         """Update user details."""
-        return bundle.obj.user == bundle.request.user.userprofile or bundle.request.user.is_superuser
+        return bundle.obj.user_id == bundle.request.user.userprofile.id or bundle.request.user.is_superuser
 
     def delete_detail(self, object_list, bundle):
         """Delete user detail."""
-        return bundle.obj.user == bundle.request.user.userprofile or bundle.request.user.is_superuser
+        return bundle.obj.user_id == bundle.request.user.userprofile.id or bundle.request.user.is_superuser
 
     def delete_list(self, object_list, bundle):
         """Delete list users."""
@@ -35,5 +35,21 @@ ERRORS_CODE = {
     'INVALID_OPERATOR': {
         'code': 408,
         'message': 'Client performed a invalid operation'
+    },
+    'DUPLICATE_TASK': {
+        'code': 409,
+        'message': 'A same {obj} is already in your list.'
+    },
+    'EXPIRED_TOKEN': {
+        'code': 410,
+        'message': 'The {obj} has expired.'
+    },
+    'THROTTLED': {
+        'code': 429,
+        'message': 'Too many requests, retry in {obj} seconds.'
+    },
+    'BUSY': {
+        'code': 503,
+        'message': 'The server is busy, retry in {obj} seconds.'
     }
 }
@@ -34,6 +34,11 @@ class CustomBadRequest(TastypieError):
             }
         }
 
+    @property
+    def error(self):
+        """Error code and message."""
+        return self._response['error']
+
     @property
     def response(self):
         """Custom response."""
@@ -1,7 +1,30 @@
 """Datetime common functions."""
 from django.conf import settings
+import re
 import pytz
 from datetime import datetime, date
+from functools import lru_cache
+
+# Distinct date and time strings parsed, and dates and times formatted, kept in memory
+DATE_CACHE_SIZE = 1024
+
+# English month names, what '%B' parses and formats under the default C locale
+MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December')
+MONTH_NUMBERS = dict((name.lower(), number) for number, name in enumerate(MONTH_NAMES, 1))
+DATE_PATTERN = re.compile(r'([A-Za-z]+)\s+(\d{1,2}),\s+(\d{4})')
+
+
+cached_timezone = lru_cache(maxsize=None)(pytz.timezone)
+
+
+def get_timezone(name=None):
+    """
+    Get a timezone object, the default one when no name is given.
+
+    @name: Timezone name is string.
+    """
+    return cached_timezone(name or settings.DEFAULT_TIMEZONE)
 
 
 def get_current_weekday(timezone=None):
@@ -10,10 +33,7 @@ def get_current_weekday(timezone=None):
 
     @timezone: Timezone is string.
     """
-    nytz = pytz.timezone(settings.DEFAULT_TIMEZONE)
-    u = datetime.utcnow().replace(tzinfo=pytz.utc)
-    currenttime = nytz.normalize(u)
-    return currenttime.strftime("%a")
+    return datetime.now(get_timezone(timezone)).strftime("%a")
 
 
 def get_current_time(timezone=None):
@@ -22,10 +42,7 @@ def get_current_time(timezone=None):
 
     @timezone: Timezone is string.
     """
-    nytz = pytz.timezone(settings.DEFAULT_TIMEZONE)
-    u = datetime.utcnow().replace(tzinfo=pytz.utc)
-    currenttime = nytz.normalize(u)
-    return currenttime.strftime("%H:%M:%S")
+    return datetime.now(get_timezone(timezone)).strftime("%H:%M:%S")
 
 
 def get_current_date(timezone=None):
@@ -34,9 +51,7 @@ def get_current_date(timezone=None):
 
     @timezone: Timezone is string
     """
-    nytz = pytz.timezone(settings.DEFAULT_TIMEZONE)
-    u = datetime.utcnow().replace(tzinfo=pytz.utc)
-    return nytz.normalize(u)
+    return datetime.now(get_timezone(timezone)).date()
 
 
 def get_second_offset(time):
@@ -65,9 +80,24 @@ def time_in_range(start, end, x):
         return start <= x or x <= end
 
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value):
+    """
+    Parse a date with '%B %d, %Y' format.
+
+    Matches the format by hand, strptime only reports the errors.
+    """
+    match = DATE_PATTERN.fullmatch(value)
+    month = match and MONTH_NUMBERS.get(match.group(1).lower())
+    if not month:
+        return datetime.strptime(value, '%B %d, %Y').date()
+    return date(int(match.group(3)), month, int(match.group(2)))
+
+
 def convert_to_date(date):
-    """Convert to date with '%B %d, %Y' format."""
-    return datetime.strptime(date, '%B %d, %Y')
+    """Convert to datetime with '%B %d, %Y' format."""
+    value = parse_date(date)
+    return datetime(value.year, value.month, value.day)
 
 
 def current_date_with_format():
@@ -75,9 +105,10 @@ def current_date_with_format():
     return "%B %d, %Y".format(date.today())
 
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
 def convert_to_string(date):
     """Convert date to string with '%B %d, %Y' format."""
-    return date.strftime('%B %d, %Y')
+    return '%s %02d, %d' % (MONTH_NAMES[date.month - 1], date.day, date.year)
 
 
 def compare_two_dates_string(date, range):
@@ -98,3 +129,42 @@ def compare_two_times_string(range):
     convert_first = datetime.strptime(components[0], "%I:%M %p")
     convert_sec = datetime.strptime(components[-1], "%I:%M %p")
     return time_in_range(convert_first, convert_sec, current_time)
+
+
+def parse_time(value):
+    """Parse a time of day with '%I:%M %p' format, 24 hour times like '21:00' or '21:00 PM' are accepted too."""
+    value = value.strip().upper()
+    for time_format in ('%I:%M %p', '%H:%M'):
+        try:
+            return datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+    if value.endswith((' AM', ' PM')):
+        return datetime.strptime(value[:-3].strip(), '%H:%M').time()
+    raise ValueError('Invalid time %r' % value)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_time_range(value):
+    """
+    Parse a time range like '08:00 AM - 12:00 PM', or a single time.
+
+    Return a (start, end) tuple of times, end is None for a single time and
+    the whole result is None for a blank value.
+    """
+    if not value or not value.strip():
+        return None
+    components = value.split('-')
+    if len(components) > 2:
+        raise ValueError('Invalid time range %r' % value)
+    start = parse_time(components[0])
+    end = parse_time(components[1]) if len(components) == 2 else None
+    return start, end
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_time_range(start, end=None):
+    """Format times to a '%I:%M %p - %I:%M %p' range, or a single time when end is None."""
+    if end is None:
+        return start.strftime('%I:%M %p')
+    return '%s - %s' % (start.strftime('%I:%M %p'), end.strftime('%I:%M %p'))
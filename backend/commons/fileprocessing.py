@@ -1,16 +1,28 @@
 """Read input file."""
+import codecs
 import csv
-import sys
 
-from account.models import Address
 
+def read_lines(fileobj, encoding='utf-8-sig'):
+    """
+    Read the text lines of a binary file one at a time.
 
-def readingfile():
-    """Reading file."""
-    with open(sys.argv[1], 'locations') as f:
-        try:
-            reader = csv.DictReader(f)
-            for row in reader:
-                Address.objects.create(zipcode=row['zipcode'])
-        except ValueError as e:
-            raise "Something's wrong. Cannot read the file %s " % e
+    @fileobj: File opened in binary mode, never read whole.
+    """
+    return codecs.getreader(encoding)(fileobj)
+
+
+def read_csv(fileobj, encoding='utf-8-sig'):
+    """
+    Read the rows of a CSV file with a header row one at a time.
+
+    Yield (line number, row dict) tuples, the keys of the row dict are the
+    lower cased header names.
+
+    @fileobj: File opened in binary mode, never read whole.
+    """
+    reader = csv.reader(read_lines(fileobj, encoding))
+    header = [name.strip().lower() for name in next(reader, [])]
+    for row in reader:
+        if any(row):
+            yield reader.line_num, dict(zip(header, row))
@@ -1,10 +1,25 @@
 """Full text search engine."""
-from djorm_pgfulltext.models import SearchManagerMixIn
+from django.db import models
+from djorm_pgfulltext.models import SearchManagerMixIn, SearchQuerySet
+
+
+class SearchQuerySetExt(SearchQuerySet):
+    """Search query set extension."""
+
+    def search(self, query, *args, **kwargs):
+        """Search, the query ends up inlined in an ``extra`` clause so escape its ``%``."""
+        if query:
+            query = query.replace('%', '%%')
+        return super(SearchQuerySetExt, self).search(query, *args, **kwargs)
 
 
 class SearchManagerMixInExt(SearchManagerMixIn):
     """Search manager mix in extension."""
 
+    def get_queryset(self):
+        """Get search query set, djorm only defines the pre Django 1.6 ``get_query_set``."""
+        return SearchQuerySetExt(model=self.model, using=self._db)
+
     def _parse_fields(self, fields):
         """Parsing needed fields."""
         parsed_fields = set()
@@ -21,3 +36,7 @@ class SearchManagerMixInExt(SearchManagerMixIn):
 
         parsed_fields.update(related_fields)
         return parsed_fields
+
+
+class SearchManagerExt(SearchManagerMixInExt, models.Manager):
+    """Search manager extension."""
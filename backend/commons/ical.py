@@ -0,0 +1,134 @@
+"""iCalendar reading and writing."""
+from __future__ import absolute_import
+import re
+from datetime import date, datetime
+import pytz
+from .datetime_utils import get_timezone
+
+ESCAPED_TEXT = re.compile(r'\\([\\;,nN])')
+SPECIAL_CHARS = re.compile(r'([\\;,])')
+# Octets a content line holds before being folded
+LINE_LENGTH = 75
+
+
+def unfold_lines(lines):
+    """Join the folded content lines of an iCalendar stream."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_content_line(line):
+    """Split a 'NAME;PARAM=VALUE:value' content line to a (name, params, value) tuple."""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        head, value = line, ''
+
+    name, _, params = head.partition(';')
+    params = dict(
+        (key.upper(), param_value.strip('"'))
+        for key, _, param_value in (param.partition('=') for param in params.split(';') if param)
+    )
+    return name.upper(), params, value
+
+
+def unescape_text(value):
+    """Unescape a TEXT value."""
+    return ESCAPED_TEXT.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def parse_date_time(value, params):
+    """
+    Parse a DATE or DATE-TIME value.
+
+    DATE-TIME values in UTC or with a known TZID are aware, floating ones are naive.
+    """
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    result = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        return pytz.utc.localize(result)
+    if 'TZID' in params:
+        try:
+            return get_timezone(params['TZID']).localize(result)
+        except pytz.UnknownTimeZoneError:
+            pass
+    return result
+
+
+def iter_events(lines):
+    """
+    Read the VEVENT components of an iCalendar stream one at a time.
+
+    Yield dicts of property name to (params, value) tuples, the names of the
+    components nested in the event, like VALARM, are listed under 'COMPONENTS'.
+    Properties of nested components are skipped.
+    """
+    event = None
+    nested = []
+    for line in unfold_lines(lines):
+        name, params, value = parse_content_line(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and event is None:
+                event, nested = {'COMPONENTS': []}, []
+            elif event is not None:
+                nested.append(value.upper())
+                event['COMPONENTS'].append(value.upper())
+        elif name == 'END' and event is not None:
+            if nested:
+                nested.pop()
+            elif value.upper() == 'VEVENT':
+                yield event
+                event = None
+        elif event is not None and not nested:
+            event.setdefault(name, (params, value))
+
+
+def escape_text(value):
+    """Escape a TEXT value."""
+    return SPECIAL_CHARS.sub(r'\\\1', value).replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold_line(line):
+    """Fold a content line to CRLF terminated lines of at most 75 octets, never splitting an UTF-8 character."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LENGTH:
+        return line + '\r\n'
+
+    parts = []
+    limit = LINE_LENGTH
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        # Continuation lines start with a space
+        limit = LINE_LENGTH - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_date(value):
+    """Format a DATE value."""
+    return '%04d%02d%02d' % (value.year, value.month, value.day)
+
+
+def format_date_time(value):
+    """Format an aware datetime as an UTC DATE-TIME value."""
+    value = value.astimezone(pytz.utc)
+    return '%04d%02d%02dT%02d%02d%02dZ' % (value.year, value.month, value.day, value.hour, value.minute, value.second)
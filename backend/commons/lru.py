@@ -0,0 +1,61 @@
+"""In-process caches."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread safe, size bounded least recently used cache with an optional time to live."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Initialize.
+
+        :param maxsize: how many entries to keep, the least recently used one is dropped first.
+        :param ttl: seconds an entry stays valid, ``None`` keeps it until it is dropped.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get a value and mark it as recently used."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] is not None and entry[0] < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Set a value, dropping the least recently used ones over ``maxsize``."""
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Drop a value."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Drop the values ``predicate`` is true of."""
+        with self._lock:
+            for key in [key for key, entry in self._data.items() if predicate(entry[1])]:
+                del self._data[key]
+
+    def clear(self):
+        """Drop every value."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        """Number of entries, expired ones included."""
+        return len(self._data)
@@ -1,5 +1,8 @@
 """Paginator."""
+from django.core import signing
+from django.db.models import Q
 from tastypie.paginator import Paginator
+from .custom_exception import CustomBadRequest
 
 
 class NoLimitPaginator(Paginator):
@@ -19,3 +22,98 @@ class PageNumberPaginator(Paginator):
         output = super(PageNumberPaginator, self).page()
         output['page_number'] = int(self.offset / self.limit) + 1
         return output
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset paginator.
+
+    Seeks on ``(sort_field, pk)`` instead of ``OFFSET`` and never counts the rows,
+    so every page costs the same no matter how deep the client is.
+    """
+
+    cursor_param = 'cursor'
+    sort_field = 'title'
+    salt = 'backend.commons.paginator.CursorPaginator'
+
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def encode_cursor(self, direction, obj):
+        """Build an opaque cursor pointing before/after ``obj``, a model instance or a ``values()`` dict."""
+        if isinstance(obj, dict):
+            return signing.dumps([direction, obj[self.sort_field], obj['id']], salt=self.salt)
+        return signing.dumps([direction, getattr(obj, self.sort_field), obj.pk], salt=self.salt)
+
+    def decode_cursor(self, cursor):
+        """Return ``(direction, position)`` of a cursor, position is None for the first page."""
+        if not cursor:
+            return self.NEXT, None
+        try:
+            direction, value, pk = signing.loads(cursor, salt=self.salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise CustomBadRequest(error_type='INVALID_PAGE', error_message='Invalid cursor')
+        if direction not in (self.NEXT, self.PREVIOUS):
+            raise CustomBadRequest(error_type='INVALID_PAGE', error_message='Invalid cursor')
+        return direction, (value, pk)
+
+    def seek(self, direction, value, pk):
+        """Filter rows strictly after (or before) a position, nulls sort last."""
+        field = self.sort_field
+        if direction == self.NEXT:
+            if value is None:
+                return Q(**{field + '__isnull': True, 'pk__gt': pk})
+            return Q(**{field + '__gt': value}) | Q(**{field: value, 'pk__gt': pk}) | \
+                Q(**{field + '__isnull': True})
+        if value is None:
+            return Q(**{field + '__isnull': True, 'pk__lt': pk}) | Q(**{field + '__isnull': False})
+        return Q(**{field + '__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+
+    def page(self):
+        """Page items."""
+        limit = self.get_limit()
+        direction, position = self.decode_cursor(self.request_data.get(self.cursor_param))
+
+        objects = self.objects
+        if position is not None:
+            objects = objects.filter(self.seek(direction, *position))
+        if direction == self.NEXT:
+            objects = objects.order_by(self.sort_field, 'pk')
+        else:
+            objects = objects.order_by('-' + self.sort_field, '-pk')
+
+        items = list(objects[:limit + 1]) if limit else list(objects)
+        has_more = bool(limit) and len(items) > limit
+        items = items[:limit] if limit else items
+        if direction == self.PREVIOUS:
+            items.reverse()
+
+        if direction == self.NEXT:
+            has_next, has_previous = has_more, position is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = self.encode_cursor(self.NEXT, items[-1])
+        if items and has_previous:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, items[0])
+
+        return {
+            self.collection_name: items,
+            'meta': {
+                'limit': limit,
+                'next': next_cursor,
+                'previous': previous_cursor,
+            }
+        }
+
+
+class CursorOptInPaginator(object):
+    """Use ``CursorPaginator`` when the request carries a cursor, page numbers otherwise."""
+
+    def __new__(cls, request_data, objects, **kwargs):
+        """Pick the paginator for this request."""
+        if CursorPaginator.cursor_param in request_data:
+            return CursorPaginator(request_data, objects, **kwargs)
+        return PageNumberPaginator(request_data, objects, **kwargs)
@@ -0,0 +1,179 @@
+"""Sliding window rate limits."""
+from __future__ import absolute_import
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.module_loading import import_string
+from tastypie.exceptions import ImmediateHttpResponse
+from tastypie.http import HttpTooManyRequests
+from tastypie.throttle import BaseThrottle
+from .constants import ERRORS_CODE
+
+logger = logging.getLogger(__name__)
+
+# Requests allowed per period, by resource name and by ``<resource name>.<url name>`` for single endpoints
+THROTTLE_RATES = getattr(settings, 'THROTTLE_RATES', {})
+# Dotted path of the class counting the requests
+THROTTLE_BACKEND = getattr(settings, 'THROTTLE_BACKEND', 'backend.commons.throttle.MemoryBackend')
+# Cache alias of the Redis server counting the requests, for ``RedisBackend``
+THROTTLE_REDIS_ALIAS = getattr(settings, 'THROTTLE_REDIS_ALIAS', 'default')
+# Clients counted by each process, for ``MemoryBackend``
+THROTTLE_MEMORY_SIZE = 100000
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Counts a request in the current window of a key, unless the window sliding over it and the previous one is full.
+# KEYS: current window, previous window. ARGV: limit, weight of the previous window, seconds the windows are kept.
+# Returns whether the request is counted, and the counts of both windows
+SLIDING_WINDOW_SCRIPT = '''
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current + 1, previous}
+'''
+
+
+def parse_rate(rate):
+    """Get the ``(requests, seconds)`` of a ``'<requests>/<period>'`` rate, None for no rate."""
+    if not rate:
+        return None
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period]
+
+
+def retry_after(limit, window, elapsed, current, previous):
+    """Seconds until the sliding window lets a request in again."""
+    if current >= limit or not previous:
+        return max(int(math.ceil(window - elapsed)), 1)
+    # The previous window's weight drops linearly until the count is under the limit, at the latest it's gone
+    seconds = (previous * (1 - elapsed / window) + current - limit) / previous * window
+    return max(int(math.ceil(min(seconds, window - elapsed))), 1)
+
+
+class MemoryBackend(object):
+    """Count requests in process, for development and tests, every process counts on its own."""
+
+    def __init__(self):
+        """Initialize."""
+        self.windows = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        """Count a request, return ``(counted, current count, previous count)``."""
+        index = int(now // window)
+        weight = 1 - (now % window) / window
+        with self.lock:
+            start, current, previous = self.windows.pop(key, (index, 0, 0))
+            if start != index:
+                current, previous = 0, current if start == index - 1 else 0
+            counted = previous * weight + current < limit
+            if counted:
+                current += 1
+            self.windows[key] = (index, current, previous)
+            while len(self.windows) > THROTTLE_MEMORY_SIZE:
+                self.windows.popitem(last=False)
+        return counted, current, previous
+
+
+class RedisBackend(object):
+    """Count requests in Redis, one script run per request, shared by every process."""
+
+    def __init__(self):
+        """Initialize."""
+        from django_redis import get_redis_connection
+        self.script = get_redis_connection(THROTTLE_REDIS_ALIAS).register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, limit, window, now):
+        """Count a request, return ``(counted, current count, previous count)``."""
+        index = int(now // window)
+        weight = 1 - (now % window) / window
+        counted, current, previous = self.script(
+            keys=['%s:%d' % (key, index), '%s:%d' % (key, index - 1)],
+            args=[limit, repr(weight), window * 2])
+        return bool(counted), int(current), int(previous)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Throttle the clients of a resource to ``THROTTLE_RATES`` over a sliding window.
+
+    The window is approximated from the counts of the current and previous
+    fixed windows, the previous one weighted by how much of it the sliding
+    window still covers. Requests are counted as they are checked, atomically,
+    throttled ones are not counted. Clients are let through when the backend
+    fails.
+    """
+
+    _backend = None
+    _backend_lock = threading.Lock()
+
+    def __init__(self, scope, rates=None):
+        """
+        Initialize.
+
+        :param scope: the resource name the rates are looked up by.
+        :param rates: rates by resource name and endpoint, ``THROTTLE_RATES`` by default.
+        """
+        super(SlidingWindowThrottle, self).__init__()
+        self.scope = scope
+        self.rates = dict((name, parse_rate(rate)) for name, rate in (rates or THROTTLE_RATES).items()
+                          if name == scope or name.startswith(scope + '.'))
+
+    @classmethod
+    def get_backend(cls):
+        """Get the shared instance of the configured backend."""
+        if cls._backend is None:
+            with cls._backend_lock:
+                if cls._backend is None:
+                    cls._backend = import_string(THROTTLE_BACKEND)()
+        return cls._backend
+
+    def get_rate(self, endpoint=None):
+        """Get the ``(requests, seconds)`` rate of an endpoint, the resource's rate for unlisted ones."""
+        if endpoint is not None:
+            name = '%s.%s' % (self.scope, endpoint)
+            if name in self.rates:
+                return self.rates[name], name
+        return self.rates.get(self.scope), self.scope
+
+    def should_be_throttled(self, identifier, endpoint=None, **kwargs):
+        """Count the request, return False when it's let through, the seconds to wait otherwise."""
+        rate, name = self.get_rate(endpoint)
+        if rate is None:
+            return False
+        limit, window = rate
+        now = time.time()
+        key = 'throttle:%s:%s' % (name, self.convert_identifier_to_key(identifier))
+        try:
+            counted, current, previous = self.get_backend().hit(key, limit, window, now)
+        except Exception:
+            logger.exception('Failed counting a request of %s', identifier)
+            return False
+        if counted:
+            return False
+        return retry_after(limit, window, now % window, current, previous)
+
+
+class EndpointThrottleMixin(object):
+    """Resource mixin checking the throttle with the endpoint the request is for, and answering 429 with JSON."""
+
+    def throttle_check(self, request):
+        """Raise a 429 response when the client is over the rate of the endpoint."""
+        match = getattr(request, 'resolver_match', None)
+        identifier = self._meta.authentication.get_identifier(request)
+        seconds = self._meta.throttle.should_be_throttled(identifier, endpoint=match.url_name if match else None)
+        if seconds:
+            error = ERRORS_CODE['THROTTLED']
+            response = HttpTooManyRequests(json.dumps({'error': {
+                'code': error['code'],
+                'message': error['message'].format(obj=seconds)
+            }}), content_type='application/json')
+            response['Retry-After'] = seconds
+            raise ImmediateHttpResponse(response=response)
@@ -1,7 +1,16 @@
 """All task apis."""
 from __future__ import absolute_import
+import json
 from django.conf.urls import url
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from tastypie import fields
+from tastypie.exceptions import NotFound
+from tastypie.http import HttpAccepted
 from tastypie.authorization import Authorization
 from tastypie.resources import ModelResource
 from tastypie.utils import trailing_slash
@@ -10,9 +19,44 @@ from ..account.authentication import ApiKeyAuthenticationExt
 from ..account.models import UserProfile
 from ..commons.custom_exception import CustomBadRequest
 from ..authorization.custom_authorization import UserObjectsOnlyAuthorization
-from .models import Task
-from ..commons.datetime_utils import get_current_date, convert_to_date
-from ..commons.paginator import PageNumberPaginator
+from .models import Task, TaskImport, task_fingerprint, task_reminder_at, task_schedule, task_time_text
+from ..commons.datetime_utils import get_current_date, convert_to_string, parse_date
+from ..commons.paginator import CursorOptInPaginator
+from ..commons.throttle import EndpointThrottleMixin, SlidingWindowThrottle
+from .manage import next_task_ids
+from .cache import cached_calendar, cached_feed, cached_listing, conditional_response, listing_etag, task_etag
+from .signals import * # noqa
+from .signals import invalidate_tasks
+from .suggest import suggester
+from .recurrence import iter_occurrences, series_occurrences
+from .export import EXPORT_FORMATS, iter_tasks
+from .feed import (FEED_CONTENT_TYPE, feed_profile_id, feed_token, feed_window, ics_chunks, iter_feed_tasks,
+                   new_feed_secret)
+from .importer import IMPORT_READERS
+from .tasks import import_tasks
+from .trash import TRASH_RETENTION
+
+# Max operations accepted by one call to the batch endpoint
+BATCH_MAX_OPERATIONS = 500
+# Task fields a batch operation may write
+BATCH_FIELDS = ('title', 'description', 'select_date', 'select_time', 'all_day',
+                'location', 'notification', 'repeat', 'is_deleted')
+# Max tasks handed out by one call to the changes endpoint
+CHANGES_MAX_LIMIT = 500
+# Changes are handed out once every transaction older than theirs has ended: a transaction still running
+# may commit changes stamped before the ones handed out
+CHANGES_HORIZON = '"task_task"."change_txid" < txid_snapshot_xmin(txid_current_snapshot())'
+CHANGES_TOKEN_SALT = 'backend.task.api.changes'
+# Max tasks handed out by one call to the trash endpoint, and restored by one call to the restore endpoint
+TRASH_MAX_LIMIT = 100
+TRASH_RESTORE_MAX_TASKS = 500
+TRASH_TOKEN_SALT = 'backend.task.api.trash'
+# Resource fields ``dehydrate`` pops off, list responses never build them
+LEAN_EXCLUDES = ('user', 'total_records', 'task_date')
+# Max days counted by one call to the calendar endpoint
+CALENDAR_MAX_DAYS = 366
+# Max size of a file uploaded to the import endpoint
+IMPORT_MAX_SIZE = 50 * 1024 * 1024
 
 
 class InternalUserProfileResource(ModelResource):
@@ -37,12 +81,17 @@ class InternalUserProfileResource(ModelResource):
         return resource_uri
 
 
-class TaskResource(ModelResource):
+class TaskResource(EndpointThrottleMixin, ModelResource):
     """Task resource model."""
 
     # people = fields.ToManyField(InternalUserProfileResource, 'people', full=True, null=True)
     user = fields.ForeignKey(InternalUserProfileResource, 'user', full=True, null=False)
     total_records = fields.CharField(attribute='total_records', default=0, readonly=True)
+    # Set from ``select_date`` and ``select_time``
+    start_at = fields.DateTimeField(attribute='start_at', null=True, readonly=True)
+    end_at = fields.DateTimeField(attribute='end_at', null=True, readonly=True)
+    # Set when the task goes to the trash
+    deleted_at = fields.DateTimeField(attribute='deleted_at', null=True, readonly=True)
 
     class Meta(object):
         """Meta data."""
@@ -58,16 +107,57 @@ class TaskResource(ModelResource):
         }
         authentication = ApiKeyAuthenticationExt()
         authorization = UserObjectsOnlyAuthorization()
+        throttle = SlidingWindowThrottle('tasks')
         always_return_data = True
-        paginator_class = PageNumberPaginator
+        paginator_class = CursorOptInPaginator
+        excludes = ['fingerprint', 'reminder_at', 'reminder_sent_at', 'reminder_fired_at', 'change_txid']
         include_resource_uri = False
 
+    def __init__(self, api_name=None):
+        """Resolve the columns and null defaults of the list fast path from the resource fields."""
+        super(TaskResource, self).__init__(api_name)
+        self.lean_fields = [(name, field.attribute, field.default if field.has_default() else None)
+                            for name, field in self.fields.items() if field.attribute and name not in LEAN_EXCLUDES]
+        self.lean_columns = [attribute for _, attribute, _ in self.lean_fields] + ['task_date']
+
     def prepend_urls(self):
         """Api urls."""
         return [
             url(r"^(?P<resource_name>%s)/listing%s$" %
                 (self._meta.resource_name, trailing_slash()),
-                self.wrap_view('get_tasks'), name="api_get_tasks")
+                self.wrap_view('get_tasks'), name="api_get_tasks"),
+            url(r"^(?P<resource_name>%s)/batch%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('batch'), name="api_batch_tasks"),
+            url(r"^(?P<resource_name>%s)/changes%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('get_changes'), name="api_get_task_changes"),
+            url(r"^(?P<resource_name>%s)/trash%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('get_trash'), name="api_get_task_trash"),
+            url(r"^(?P<resource_name>%s)/trash/restore%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('restore'), name="api_restore_tasks"),
+            url(r"^(?P<resource_name>%s)/suggest%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('suggest'), name="api_suggest_task_titles"),
+            url(r"^(?P<resource_name>%s)/calendar%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('get_calendar'), name="api_get_task_calendar"),
+            url(r"^(?P<resource_name>%s)/export%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('export'), name="api_export_tasks"),
+            url(r"^(?P<resource_name>%s)/import%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('upload_import'), name="api_import_tasks"),
+            url(r"^(?P<resource_name>%s)/import/(?P<import_id>\d+)%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('get_import'), name="api_get_task_import"),
+            url(r"^(?P<resource_name>%s)/feed%s$" %
+                (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('get_feed_url'), name="api_get_task_feed_url"),
+            url(r"^(?P<resource_name>%s)/feed\.ics$" % self._meta.resource_name,
+                self.wrap_view('get_feed'), name="api_get_task_feed"),
         ]
 
     def validation(self, bundle):
@@ -79,23 +169,34 @@ class TaskResource(ModelResource):
                 raise CustomBadRequest(error_type='INVALID_OPERATOR', error_message="Cant create the task")
 
     def validate_duplicate(self, bundle):
-        """Task duplicate validation."""
-        title = bundle.data['title']
-        date = bundle.data['select_date']
-        time = bundle.data['select_time']
-        if title and date and time:
-            if Task.objects.filter(title__iexact=title, select_time__iexact=time, select_date__iexact=date).exists():
-                raise CustomBadRequest(error_type='DUPLICATE_TASK', error_message="A same task is already in your list")
+        """Task duplicate validation, probes the unique index of the user's live fingerprints."""
+        try:
+            task_date = parse_date(bundle.data.get('select_date'))
+        except (TypeError, ValueError):
+            return
+        select_time = task_time_text(*task_schedule(task_date, bundle.data.get('select_time')))
+        fingerprint = task_fingerprint(bundle.request.user.userprofile.id, bundle.data.get('title'),
+                                       task_date, select_time)
+        if fingerprint and Task.objects.filter(fingerprint=fingerprint, is_deleted=False).exists():
+            raise CustomBadRequest(error_type='DUPLICATE_TASK', error_message="A same task is already in your list")
 
     def hydrate(self, bundle):
         """Tastypie hydrate func."""
         # Always tie task to the current user profile
         if bundle.request.method == 'POST':
             bundle.data["user"] = bundle.request.user.userprofile
-        rq_date = bundle.data["select_date"]
-        bundle.data["task_date"] = convert_to_date(rq_date)
+        rq_date = bundle.data.get("select_date")
+        if rq_date:
+            bundle.data["task_date"] = parse_date(rq_date)
         return super(TaskResource, self).hydrate(bundle)
 
+    def full_hydrate(self, bundle):
+        """Tastypie full_hydrate func, stores the parsed date and time, their texts are derived on output."""
+        select_time = bundle.data["select_time"] if "select_time" in bundle.data else bundle.obj.time_text
+        bundle = super(TaskResource, self).full_hydrate(bundle)
+        bundle.obj.set_schedule(bundle.obj.task_date, select_time)
+        return bundle
+
     def dehydrate(self, bundle):
         """Tastypie dehydrate func."""
         if "user" in bundle.data:
@@ -104,16 +205,52 @@ class TaskResource(ModelResource):
             bundle.data.pop('total_records', None)
         if 'task_date' in bundle.data:
             bundle.data.pop('task_date', None)
+        task = bundle.obj
+        if task.task_date is not None:
+            bundle.data['select_date'] = convert_to_string(task.task_date)
+        bundle.data['select_time'] = task.time_text
         return super(TaskResource, self).dehydrate(bundle)
 
-    def build_filters(self, filters=None):
+    def lean_dehydrate(self, row):
+        """
+        Get the output of a task read as a dict of ``lean_columns``, the same as ``full_dehydrate`` gives.
+
+        Skips the bundle, the nested user and the per field dehydration, most
+        of the cost of a listing.
+        """
+        task = {name: row[attribute] if row[attribute] is not None else default
+                for name, attribute, default in self.lean_fields}
+        if row['task_date'] is not None:
+            task['select_date'] = convert_to_string(row['task_date'])
+        task['select_time'] = task_time_text(row['start_at'], row['end_at'], row['select_time'])
+        return task
+
+    def get_lean_list(self, request, **kwargs):
+        """Tastypie get_list, with the tasks read by ``values()`` and serialized by ``lean_dehydrate``."""
+        base_bundle = self.build_bundle(request=request)
+        objects = self.obj_get_list(bundle=base_bundle, **self.remove_api_resource_names(kwargs))
+        sorted_objects = self.apply_sorting(objects, options=request.GET) \
+            .prefetch_related(None) \
+            .values(*self.lean_columns)
+
+        paginator = self._meta.paginator_class(request.GET, sorted_objects, resource_uri=self.get_resource_uri(),
+                                               limit=self._meta.limit, max_limit=self._meta.max_limit,
+                                               collection_name=self._meta.collection_name)
+        to_be_serialized = paginator.page()
+        to_be_serialized[self._meta.collection_name] = [
+            self.lean_dehydrate(row) for row in to_be_serialized[self._meta.collection_name]
+        ]
+        to_be_serialized = self.alter_list_data_to_serialize(request, to_be_serialized)
+        return self.create_response(request, to_be_serialized)
+
+    def build_filters(self, filters=None, ignore_bad_filters=False):
         """Tastypie build_filters func."""
         if filters is None:
             filters = {}
         q = None
         if 'q' in filters:
             q = filters.pop('q')
-        orm_filters = super(TaskResource, self).build_filters(filters)
+        orm_filters = super(TaskResource, self).build_filters(filters, ignore_bad_filters=ignore_bad_filters)
         if q:
             orm_filters['q'] = q
 
@@ -130,16 +267,43 @@ class TaskResource(ModelResource):
         # Always get task belong to an user
         semi_filtered = semi_filtered.filter(user_id=request.user.userprofile.id, is_deleted=False)
         # Just only get tasks that has date is greater than the current dates
-        q_date = request.GET.get('date', None)
-        if q_date is None:
-            current_date = get_current_date()
-        else:
-            current_date = convert_to_date(q_date)
-        semi_filtered = semi_filtered.filter(task_date=current_date)
+        # and the repeating tasks that occur on it
+        listing_date = self.get_listing_date(request)
+        # Both sides name their task dates, a partitioned table only reads the partitions holding them
+        on_date = Q(task_date=listing_date)
+        occurring = series_occurrences(request.user.userprofile.id, listing_date, listing_date).get(listing_date)
+        if occurring:
+            on_date |= Q(id__in=[task_id for task_id, _ in occurring],
+                         task_date__in=set(task_date for _, task_date in occurring))
+        semi_filtered = semi_filtered.filter(on_date)
         if q:
-            semi_filtered = semi_filtered.search(q[0], raw=True, fields=('title',))
+            semi_filtered = semi_filtered.search(q[0], rank_field='rank')
         return semi_filtered
 
+    def get_listing_date(self, request):
+        """Get the day a listing is for, today unless the ``date`` param is given."""
+        q_date = request.GET.get('date', None)
+        if q_date is None:
+            return get_current_date()
+        return parse_date(q_date)
+
+    def get_list(self, request, **kwargs):
+        """Tastypie get_list func, answers 304 while the listed day is unchanged."""
+        profile_id = request.user.userprofile.id
+        etag = listing_etag(request, profile_id, self.get_listing_date(request))
+        return conditional_response(request, etag, lambda: self.get_lean_list(request, **kwargs))
+
+    def get_detail(self, request, **kwargs):
+        """Tastypie get_detail func, answers 304 while the task is unchanged."""
+        profile_id = request.user.userprofile.id
+        pk = kwargs.get('pk', '')
+        task = Task.objects.filter(pk=pk, user_id=profile_id).values_list('id', 'task_date').first() \
+            if pk.isdigit() else None
+        if task is None:
+            return super(TaskResource, self).get_detail(request, **kwargs)
+        etag = task_etag(request, task[0], profile_id, task[1])
+        return conditional_response(request, etag, lambda: super(TaskResource, self).get_detail(request, **kwargs))
+
     def obj_get(self, bundle, **kwargs):
         """Tastypie obj_get func."""
         return super(TaskResource, self).obj_get(bundle, **kwargs)
@@ -147,12 +311,36 @@ class TaskResource(ModelResource):
     def obj_create(self, bundle, **kwargs):
         """Tastypie obj_create func."""
         self.validation(bundle)
-        # self.validate_duplicate(bundle)
+        self.validate_duplicate(bundle)
         try:
-            return super(TaskResource, self).obj_create(bundle, **kwargs)
+            with transaction.atomic():
+                return super(TaskResource, self).obj_create(bundle, **kwargs)
+        except IntegrityError:
+            # Lost the race against a same task created meanwhile
+            raise CustomBadRequest(error_type='DUPLICATE_TASK', error_message="A same task is already in your list")
         except Exception as e:
             raise CustomBadRequest(error_type='UNKNOWNERROR', error_message=str(e))
 
+    def obj_update(self, bundle, skip_errors=False, **kwargs):
+        """Tastypie obj_update func."""
+        try:
+            with transaction.atomic():
+                return super(TaskResource, self).obj_update(bundle, skip_errors=skip_errors, **kwargs)
+        except IntegrityError:
+            raise CustomBadRequest(error_type='DUPLICATE_TASK', error_message="A same task is already in your list")
+
+    def obj_delete(self, bundle, **kwargs):
+        """Tastypie obj_delete func, keeps the task as a tombstone so synced clients see the delete."""
+        if not hasattr(bundle.obj, 'delete'):
+            try:
+                bundle.obj = self.obj_get(bundle=bundle, **kwargs)
+            except Task.DoesNotExist:
+                raise NotFound("A model instance matching the provided arguments could not be found.")
+
+        self.authorized_delete_detail(self.get_object_list(bundle.request), bundle)
+        bundle.obj.is_deleted = True
+        bundle.obj.save(update_fields=['is_deleted', 'updated_at'])
+
     # def save_m2m(self, bundle):
     #     people = bundle.data['people']
     #     for user in people:
@@ -167,4 +355,556 @@ class TaskResource(ModelResource):
         self.throttle_check(request)
 
         self.log_throttled_access(request)
-        return self.get_list(request)
+        profile_id = request.user.userprofile.id
+        task_date = self.get_listing_date(request)
+        return conditional_response(request, listing_etag(request, profile_id, task_date), lambda: cached_listing(
+            request, profile_id, task_date, self.determine_format(request), lambda: self.get_lean_list(request)))
+
+    def batch(self, request, **kwargs):
+        """Create, update and delete many tasks in a single transaction."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['post'])
+        self.throttle_check(request)
+
+        data = self.deserialize(request, request.body, format=request.META.get('CONTENT_TYPE', 'application/json'))
+        operations = data.get('operations') if isinstance(data, dict) else None
+        if not isinstance(operations, list):
+            raise CustomBadRequest(error_type='MISSING_FIELD', field='operations', obj='batch')
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            raise CustomBadRequest(error_type='INVALID_OPERATOR',
+                                   error_message="A batch can't hold more than %s operations" % BATCH_MAX_OPERATIONS)
+
+        profile_id = request.user.userprofile.id
+        requested_ids = [op.get('id') for op in operations if isinstance(op, dict) and isinstance(op.get('id'), int)]
+        owned = dict((task['id'], task) for task in
+                     Task.objects.filter(user_id=profile_id, id__in=requested_ids)
+                     .values('id', 'title', 'select_time', 'start_at', 'end_at', 'task_date', 'all_day',
+                             'notification', 'repeat', 'is_deleted', 'fingerprint', 'reminder_fired_at'))
+        owned_ids = set(owned)
+
+        results = [None] * len(operations)
+        task_dates = {}
+        creates, updates, update_indexes, deletes = [], {}, {}, set()
+        for index, operation in enumerate(operations):
+            try:
+                action, task_id, fields = self.parse_batch_operation(operation, owned_ids, task_dates)
+                if action == 'create':
+                    self.validation(self.build_bundle(data=fields, request=request))
+                    creates.append((index, fields))
+                elif action == 'update':
+                    updates.setdefault(task_id, {}).update(fields)
+                    update_indexes.setdefault(task_id, []).append(index)
+                    results[index] = {'success': True, 'id': task_id}
+                else:
+                    deletes.add(task_id)
+                    results[index] = {'success': True, 'id': task_id}
+            except CustomBadRequest as e:
+                results[index] = {'success': False, 'error': e.error}
+
+        self.schedule_batch_writes(owned, creates, updates)
+        # Tasks going to the trash get their deletion time, restored ones lose it
+        now = timezone.now()
+        for task_id, fields in [(None, fields) for _, fields in creates] + list(updates.items()):
+            if 'is_deleted' not in fields:
+                continue
+            if not fields['is_deleted']:
+                fields['deleted_at'] = None
+            elif not owned.get(task_id, {}).get('is_deleted'):
+                fields['deleted_at'] = now
+        creates = self.check_batch_duplicates(profile_id, owned, creates, updates, update_indexes, deletes, results)
+
+        # Deletes go first, they release fingerprints the other writes may take
+        try:
+            with transaction.atomic():
+                if deletes:
+                    Task.objects.filter(user_id=profile_id, id__in=deletes, is_deleted=False) \
+                        .update(is_deleted=True, deleted_at=timezone.now(), updated_at=timezone.now())
+                if updates:
+                    self.apply_batch_updates(updates)
+                if creates:
+                    ids = next_task_ids(len(creates))
+                    Task.objects.bulk_create([Task(id=task_id, user_id=profile_id, **fields)
+                                              for task_id, (_, fields) in zip(ids, creates)])
+                    for task_id, (index, _) in zip(ids, creates):
+                        results[index] = {'success': True, 'id': task_id}
+        except IntegrityError:
+            raise CustomBadRequest(error_type='DUPLICATE_TASK',
+                                   error_message="The batch duplicates a task created meanwhile")
+
+        # Bulk writes skip the model signals, invalidate the cached days here once the request commits
+        touched = [(owned[task_id]['task_date'], owned[task_id]['repeat'])
+                   for task_id in list(updates) + list(deletes)]
+        touched += [(fields.get('task_date'), fields.get('repeat')) for fields in
+                    list(updates.values()) + [fields for _, fields in creates]]
+        task_dates = set(task_date for task_date, _ in touched)
+        series = any(repeat for _, repeat in touched)
+        transaction.on_commit(lambda: invalidate_tasks(profile_id, task_dates, series))
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {'objects': results})
+
+    def parse_batch_operation(self, operation, owned_ids, task_dates):
+        """Check a batch operation and return its action, task id and hydrated fields."""
+        if not isinstance(operation, dict):
+            raise CustomBadRequest(error_type='INVALID_DATA')
+        action = operation.get('action')
+        if action not in ('create', 'update', 'delete'):
+            raise CustomBadRequest(error_type='INVALID_OPERATOR', error_message='Unknown batch action')
+
+        task_id = operation.get('id')
+        if action != 'create' and (not isinstance(task_id, int) or task_id not in owned_ids):
+            raise CustomBadRequest(error_type='DOES_NOT_EXITS', obj='task')
+
+        data = operation.get('data') or {}
+        if not isinstance(data, dict):
+            raise CustomBadRequest(error_type='INVALID_DATA')
+        fields = dict((name, data[name]) for name in BATCH_FIELDS if name in data)
+        if fields.get('select_date'):
+            # Clients tend to sync many tasks of the same day, parse each date once
+            rq_date = fields['select_date']
+            try:
+                if rq_date not in task_dates:
+                    task_dates[rq_date] = parse_date(rq_date)
+            except (TypeError, ValueError):
+                raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid select_date')
+            fields['task_date'] = task_dates[rq_date]
+        return action, task_id, fields
+
+    def schedule_batch_writes(self, owned, creates, updates):
+        """
+        Turn the dates and times of batch writes to the stored ``task_date``, ``start_at`` and ``end_at``.
+
+        Writes changing the schedule or the notification of a task, or restoring it, get its next ``reminder_at``
+        too.
+        """
+        writes = [(None, fields) for _, fields in creates] + list(updates.items())
+        for task_id, fields in writes:
+            task = owned.get(task_id, {})
+            if 'task_date' in fields or 'select_time' in fields:
+                if 'select_time' in fields:
+                    select_time = fields['select_time']
+                else:
+                    select_time = task_time_text(task.get('start_at'), task.get('end_at'), task.get('select_time'))
+                fields['start_at'], fields['end_at'], fields['select_time'] = \
+                    task_schedule(fields.get('task_date', task.get('task_date')), select_time)
+                if 'task_date' in fields:
+                    fields['select_date'] = ''
+            if task_id is None or any(name in fields for name in ('task_date', 'start_at', 'all_day', 'notification',
+                                                                   'repeat', 'is_deleted')):
+                task = dict(task, **fields)
+                fields['reminder_at'] = task_reminder_at(task.get('task_date'), task.get('start_at'),
+                                                         task.get('all_day'), task.get('notification'),
+                                                         task.get('repeat'), fired_at=task.get('reminder_fired_at'))
+
+    def check_batch_duplicates(self, profile_id, owned, creates, updates, update_indexes, deletes, results):
+        """
+        Fingerprint the batch writes and fail the ones that would duplicate a live task.
+
+        Checks every write with one probe of the fingerprint index, then returns
+        the creates left. Rejected updates are dropped from ``updates``.
+        """
+        candidates, released = [], set(deletes)
+        for task_id, fields in updates.items():
+            task = dict(owned[task_id], **fields)
+            select_time = task_time_text(task['start_at'], task['end_at'], task['select_time'])
+            fields['fingerprint'] = task_fingerprint(profile_id, task['title'], task['task_date'], select_time)
+            live = task_id not in deletes and not task['is_deleted']
+            if not live or fields['fingerprint'] != owned[task_id]['fingerprint']:
+                released.add(task_id)
+            if live and (owned[task_id]['is_deleted'] or task_id in released):
+                candidates.append((min(update_indexes[task_id]), task_id, fields['fingerprint']))
+        for index, fields in creates:
+            select_time = task_time_text(fields.get('start_at'), fields.get('end_at'), fields.get('select_time'))
+            fields['fingerprint'] = task_fingerprint(profile_id, fields.get('title'), fields.get('task_date'),
+                                                     select_time)
+            if not fields.get('is_deleted'):
+                candidates.append((index, None, fields['fingerprint']))
+
+        fingerprints = [fingerprint for _, _, fingerprint in candidates if fingerprint]
+        taken = set(Task.objects.filter(user_id=profile_id, fingerprint__in=fingerprints, is_deleted=False)
+                    .exclude(id__in=released).values_list('fingerprint', flat=True)) if fingerprints else set()
+
+        error = CustomBadRequest(error_type='DUPLICATE_TASK', obj='task').error
+        rejected = set()
+        for index, task_id, fingerprint in sorted(candidates):
+            if fingerprint is None:
+                continue
+            if fingerprint in taken:
+                rejected.add(index)
+                if task_id is not None:
+                    updates.pop(task_id)
+                    for update_index in update_indexes[task_id]:
+                        results[update_index] = {'success': False, 'error': error}
+                else:
+                    results[index] = {'success': False, 'error': error}
+            taken.add(fingerprint)
+        return [(index, fields) for index, fields in creates if index not in rejected]
+
+    def apply_batch_updates(self, updates):
+        """Update many tasks with one UPDATE, each column picks its new value per row."""
+        columns = {}
+        for task_id, fields in updates.items():
+            for name, value in fields.items():
+                columns.setdefault(name, []).append(When(pk=task_id, then=Value(value)))
+
+        values = dict(
+            (name, Case(*whens, default=F(name), output_field=Task._meta.get_field(name)))
+            for name, whens in columns.items()
+        )
+        values['updated_at'] = timezone.now()
+        Task.objects.filter(id__in=list(updates)).update(**values)
+
+    def get_changes(self, request, **kwargs):
+        """Get the user's tasks created, updated or deleted since a sync token."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        since = request.GET.get('since', None)
+        try:
+            limit = min(int(request.GET.get('limit', CHANGES_MAX_LIMIT)), CHANGES_MAX_LIMIT)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid limit')
+
+        changes = Task.objects.filter(user_id=request.user.userprofile.id).extra(where=[CHANGES_HORIZON])
+        if since:
+            change_txid, task_id = self.decode_sync_token(since)
+            changes = changes.filter(Q(change_txid__gt=change_txid) | Q(change_txid=change_txid, id__gt=task_id))
+        tasks = list(changes.order_by('change_txid', 'id').values('change_txid', *self.lean_columns)[:limit + 1])
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+
+        if tasks:
+            token = self.encode_sync_token(tasks[-1]['change_txid'], tasks[-1]['id'])
+        elif since:
+            token = self.encode_sync_token(change_txid, task_id)
+        else:
+            token = None
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {
+            'meta': {'limit': limit, 'has_more': has_more, 'next_token': token},
+            'objects': [self.lean_dehydrate(task) for task in tasks]
+        })
+
+    def encode_sync_token(self, change_txid, task_id):
+        """Build the sync token pointing right after a task, stamped with the time it is handed out."""
+        return signing.dumps([change_txid, task_id, timezone.now().isoformat()], salt=CHANGES_TOKEN_SALT)
+
+    def decode_sync_token(self, token):
+        """
+        Get the ``(change_txid, id)`` position of a sync token.
+
+        Tokens handed out before the trash retention may miss deletes of purged
+        tasks, and tokens holding an ``updated_at`` position come from before
+        the transaction ids: both are refused so the client syncs again from scratch.
+        """
+        try:
+            values = signing.loads(token, salt=CHANGES_TOKEN_SALT)
+        except signing.BadSignature:
+            values = None
+        if not isinstance(values, list) or not values:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid sync token')
+        if len(values) != 3 or not isinstance(values[0], int):
+            raise CustomBadRequest(error_type='EXPIRED_TOKEN', obj='sync token')
+        change_txid, task_id, issued_at = values
+        try:
+            issued_at = parse_datetime(issued_at)
+        except (TypeError, ValueError):
+            issued_at = None
+        if issued_at is None:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid sync token')
+        if issued_at < timezone.now() - TRASH_RETENTION:
+            raise CustomBadRequest(error_type='EXPIRED_TOKEN', obj='sync token')
+        return change_txid, task_id
+
+    def get_trash(self, request, **kwargs):
+        """Get the user's deleted tasks, most recently deleted first, a keyset page at a time."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        cursor = request.GET.get('cursor', None)
+        try:
+            limit = min(int(request.GET.get('limit', TRASH_MAX_LIMIT)), TRASH_MAX_LIMIT)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid limit')
+
+        trash = Task.objects.filter(user_id=request.user.userprofile.id, is_deleted=True)
+        if cursor:
+            try:
+                deleted_at, task_id = signing.loads(cursor, salt=TRASH_TOKEN_SALT)
+                deleted_at = parse_datetime(deleted_at)
+            except (signing.BadSignature, TypeError, ValueError):
+                deleted_at = None
+            if deleted_at is None:
+                raise CustomBadRequest(error_type='INVALID_PAGE', error_message='Invalid cursor')
+            trash = trash.filter(Q(deleted_at__lt=deleted_at) | Q(deleted_at=deleted_at, id__lt=task_id))
+        tasks = list(trash.order_by('-deleted_at', '-id').values(*self.lean_columns)[:limit + 1])
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+
+        next_cursor = signing.dumps([tasks[-1]['deleted_at'].isoformat(), tasks[-1]['id']], salt=TRASH_TOKEN_SALT) \
+            if has_more else None
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {
+            'meta': {'limit': limit, 'has_more': has_more, 'next': next_cursor},
+            'objects': [self.lean_dehydrate(task) for task in tasks]
+        })
+
+    def restore(self, request, **kwargs):
+        """Take many of the user's tasks out of the trash in one transaction."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['post'])
+        self.throttle_check(request)
+
+        data = self.deserialize(request, request.body, format=request.META.get('CONTENT_TYPE', 'application/json'))
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(task_id, int) for task_id in ids):
+            raise CustomBadRequest(error_type='MISSING_FIELD', field='ids', obj='restore')
+        if len(ids) > TRASH_RESTORE_MAX_TASKS:
+            raise CustomBadRequest(error_type='INVALID_OPERATOR',
+                                   error_message="Can't restore more than %s tasks at once" % TRASH_RESTORE_MAX_TASKS)
+
+        profile_id = request.user.userprofile.id
+        deleted = dict((task['id'], task) for task in
+                       Task.objects.filter(user_id=profile_id, id__in=ids, is_deleted=True)
+                       .values('id', 'task_date', 'start_at', 'all_day', 'notification', 'repeat', 'fingerprint',
+                               'reminder_fired_at'))
+
+        # A task taking back its fingerprint must not duplicate a live task, nor another restored one
+        fingerprints = [task['fingerprint'] for task in deleted.values() if task['fingerprint']]
+        taken = set(Task.objects.filter(user_id=profile_id, fingerprint__in=fingerprints, is_deleted=False)
+                    .values_list('fingerprint', flat=True)) if fingerprints else set()
+        results, restored = [], {}
+        for task_id in ids:
+            task = deleted.get(task_id)
+            if task_id in restored:
+                results.append({'success': True, 'id': task_id})
+                continue
+            if task is None:
+                error = CustomBadRequest(error_type='DOES_NOT_EXITS', obj='deleted task').error
+            elif task['fingerprint'] in taken:
+                error = CustomBadRequest(error_type='DUPLICATE_TASK', obj='task').error
+            else:
+                if task['fingerprint']:
+                    taken.add(task['fingerprint'])
+                restored[task_id] = task
+                results.append({'success': True, 'id': task_id})
+                continue
+            results.append({'success': False, 'id': task_id, 'error': error})
+
+        if restored:
+            # Reminders that passed while the tasks were in the trash are skipped
+            reminders = [When(pk=task_id, then=Value(task_reminder_at(
+                task['task_date'], task['start_at'], task['all_day'], task['notification'], task['repeat'],
+                fired_at=task['reminder_fired_at'])))
+                for task_id, task in restored.items()]
+            try:
+                with transaction.atomic():
+                    Task.objects.filter(id__in=list(restored), is_deleted=True).update(
+                        is_deleted=False, deleted_at=None, updated_at=timezone.now(),
+                        reminder_at=Case(*reminders, output_field=Task._meta.get_field('reminder_at')))
+            except IntegrityError:
+                raise CustomBadRequest(error_type='DUPLICATE_TASK',
+                                       error_message="The restore duplicates a task created meanwhile")
+
+            # Bulk writes skip the model signals, invalidate the cached days here once the request commits
+            task_dates = set(task['task_date'] for task in restored.values())
+            series = any(task['repeat'] for task in restored.values())
+            transaction.on_commit(lambda: invalidate_tasks(profile_id, task_dates, series))
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {'objects': results})
+
+    def suggest(self, request, **kwargs):
+        """Suggest the user's task titles starting with ``prefix``."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        titles = suggester.suggest(request.user.userprofile.id, request.GET.get('prefix', ''))
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {'objects': titles})
+
+    def get_calendar(self, request, **kwargs):
+        """Get the user's task counts per day within ``[from, to]``."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        start = self.get_calendar_date(request, 'from')
+        end = self.get_calendar_date(request, 'to')
+        if end < start:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message="``to`` can't be before ``from``")
+        if (end - start).days >= CALENDAR_MAX_DAYS:
+            raise CustomBadRequest(error_type='INVALID_OPERATOR',
+                                   error_message="A calendar can't span more than %s days" % CALENDAR_MAX_DAYS)
+
+        profile_id = request.user.userprofile.id
+        # Past days hardly ever change, the current ones would only churn the cache
+        if end < get_current_date():
+            days = cached_calendar(profile_id, start, end, lambda: self.count_calendar_days(profile_id, start, end))
+        else:
+            days = self.count_calendar_days(profile_id, start, end)
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {
+            'meta': {'from': convert_to_string(start), 'to': convert_to_string(end)},
+            'objects': days
+        })
+
+    def get_calendar_date(self, request, param):
+        """Get a required calendar date param."""
+        value = request.GET.get(param, None)
+        if not value:
+            raise CustomBadRequest(error_type='MISSING_FIELD', field=param, obj='calendar')
+        try:
+            return parse_date(value)
+        except ValueError:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid %s' % param)
+
+    def count_calendar_days(self, profile_id, start, end):
+        """
+        Count the user's tasks of every day in ``[start, end]``, split by ``all_day`` and ``notification``.
+
+        One ``GROUP BY`` over the listing index counts the tasks dated in the
+        range, repeating tasks are then added on the days they recur.
+        """
+        def flagged(field):
+            return Sum(Case(When(**{field + '__gt': 0}, then=Value(1)), default=Value(0), output_field=IntegerField()))
+
+        rows = Task.objects \
+            .filter(user_id=profile_id, is_deleted=False, task_date__range=(start, end)) \
+            .values('task_date') \
+            .annotate(total_count=Count('id'), all_day_count=flagged('all_day'),
+                      notification_count=flagged('notification')) \
+            .order_by('task_date')
+        counts = dict((row['task_date'], [row['total_count'], row['all_day_count'], row['notification_count']])
+                      for row in rows)
+
+        for day, (all_day, notification) in iter_occurrences(profile_id, start, end, ('all_day', 'notification')):
+            day_counts = counts.setdefault(day, [0, 0, 0])
+            day_counts[0] += 1
+            day_counts[1] += 1 if all_day else 0
+            day_counts[2] += 1 if notification else 0
+
+        return [{'date': convert_to_string(day), 'total': total, 'all_day': all_day, 'notification': notification}
+                for day, (total, all_day, notification) in sorted(counts.items())]
+
+    def export(self, request, **kwargs):
+        """Stream all the user's tasks as NDJSON or CSV, in constant memory."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise CustomBadRequest(error_type='INVALID_DATA',
+                                   error_message='format must be one of %s' % ', '.join(sorted(EXPORT_FORMATS)))
+        serialize, content_type, extension = EXPORT_FORMATS[export_format]
+
+        response = StreamingHttpResponse(serialize(iter_tasks(request.user.userprofile.id)),
+                                         content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="tasks.%s"' % extension
+        self.log_throttled_access(request)
+        return response
+
+    def upload_import(self, request, **kwargs):
+        """Upload a CSV or iCalendar file of tasks, a background job imports them."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['post'])
+        self.throttle_check(request)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise CustomBadRequest(error_type='MISSING_FIELD', field='file', obj='import')
+        file_format = request.POST.get('format') or upload.name.rpartition('.')[2].lower()
+        if file_format not in IMPORT_READERS:
+            raise CustomBadRequest(error_type='INVALID_DATA',
+                                   error_message='format must be one of %s' % ', '.join(sorted(IMPORT_READERS)))
+        if upload.size > IMPORT_MAX_SIZE:
+            raise CustomBadRequest(error_type='INVALID_DATA',
+                                   error_message="The file can't be bigger than %s MB" % (IMPORT_MAX_SIZE >> 20))
+
+        task_import = TaskImport.objects.create(user=request.user.userprofile, file_format=file_format, file=upload)
+        # The worker must find the import, queue it once the request's transaction commits
+        transaction.on_commit(lambda: import_tasks.delay(task_import.id))
+
+        self.log_throttled_access(request)
+        return self.create_response(request, self.import_status(task_import), response_class=HttpAccepted)
+
+    def get_import(self, request, **kwargs):
+        """Get the progress of one of the user's imports."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get'])
+        self.throttle_check(request)
+
+        task_import = TaskImport.objects.filter(id=kwargs['import_id'], user_id=request.user.userprofile.id).first()
+        if task_import is None:
+            raise CustomBadRequest(error_type='DOES_NOT_EXITS', obj='import')
+
+        self.log_throttled_access(request)
+        return self.create_response(request, self.import_status(task_import))
+
+    def import_status(self, task_import):
+        """Status of an import."""
+        return {
+            'id': task_import.id,
+            'format': task_import.file_format,
+            'status': task_import.status,
+            'rows_processed': task_import.rows_processed,
+            'rows_imported': task_import.rows_imported,
+            'errors_count': task_import.errors_count,
+            'errors': json.loads(task_import.errors),
+            'created_at': task_import.created_at,
+            'finished_at': task_import.finished_at,
+        }
+
+    def get_feed_url(self, request, **kwargs):
+        """Get the url of the user's iCalendar feed, POST replaces it and revokes the urls handed out before."""
+        self.is_authenticated(request)
+        self.method_check(request, allowed=['get', 'post'])
+        self.throttle_check(request)
+
+        profile_id = request.user.userprofile.id
+        profiles = UserProfile.objects.filter(id=profile_id)
+        if request.method == 'POST':
+            profiles.update(feed_secret=new_feed_secret())
+        else:
+            # The first url of an user, concurrent requests agree on a single secret
+            profiles.filter(feed_secret='').update(feed_secret=new_feed_secret())
+        secret = profiles.values_list('feed_secret', flat=True).first()
+
+        url = self._build_reverse_url('api_get_task_feed', kwargs={
+            'resource_name': self._meta.resource_name, 'api_name': self._meta.api_name})
+        token = feed_token(profile_id, secret)
+
+        self.log_throttled_access(request)
+        return self.create_response(request, {'url': request.build_absolute_uri('%s?token=%s' % (url, token))})
+
+    def get_feed(self, request, **kwargs):
+        """
+        Stream the iCalendar feed of the user owning ``token``, over a window around today.
+
+        Calendar apps poll feeds, they get ``304 Not Modified`` until a task of the user changes.
+        """
+        self.method_check(request, allowed=['get'])
+        # Counted by address, the token is checked afterwards so guessing tokens is throttled too
+        self.throttle_check(request)
+
+        profile_id = feed_profile_id(request.GET.get('token', ''))
+        if profile_id is None:
+            raise CustomBadRequest(error_type='INVALID_DATA', error_message='Invalid feed token')
+
+        today = get_current_date()
+        start, end = feed_window(today)
+        self.log_throttled_access(request)
+        return cached_feed(request, profile_id, today, FEED_CONTENT_TYPE,
+                           lambda: ics_chunks(iter_feed_tasks(profile_id, start, end)))
@@ -0,0 +1,264 @@
+"""Task listing cache."""
+from __future__ import absolute_import
+import hashlib
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+LISTING_TIMEOUT = getattr(settings, 'TASK_LISTING_CACHE_TIMEOUT', 300)
+LISTING_SERVE_STALE = getattr(settings, 'TASK_LISTING_CACHE_SERVE_STALE', True)
+LISTING_STALE_TIMEOUT = getattr(settings, 'TASK_LISTING_CACHE_STALE_TIMEOUT', 3600)
+CALENDAR_TIMEOUT = getattr(settings, 'TASK_CALENDAR_CACHE_TIMEOUT', 86400)
+FEED_TIMEOUT = getattr(settings, 'TASK_FEED_CACHE_TIMEOUT', 86400)
+FEED_CACHE_MAX_SIZE = getattr(settings, 'TASK_FEED_CACHE_MAX_SIZE', 1024 * 1024)
+# Seconds version counters live. A counter coming back after it expired starts above every version it
+# handed out, pages cached under the old ones just become unreachable
+VERSION_TIMEOUT = getattr(settings, 'TASK_CACHE_VERSION_TIMEOUT', 7 * 86400)
+# How long a request may hold the right to re-render a listing
+REFRESH_LOCK_TIMEOUT = 10
+
+# Query params that never change the listing body
+IGNORED_PARAMS = ('api_key',)
+
+
+def as_day(value):
+    """Task dates are sometimes assigned as datetimes, key them by day."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def day_version_key(profile_id, task_date):
+    """Cache key of the version counter of an user's day."""
+    return 'tasks:version:%s:%s' % (profile_id, as_day(task_date))
+
+
+def month_version_key(profile_id, task_date):
+    """Cache key of the version counter of an user's month, bumped with every day of it."""
+    task_date = as_day(task_date)
+    return 'tasks:version:%s:month:%04d-%02d' % (profile_id, task_date.year, task_date.month)
+
+
+def series_version_key(profile_id):
+    """Cache key of the version counter of an user's repeating tasks."""
+    return 'tasks:version:%s:series' % profile_id
+
+
+def feed_version_key(profile_id):
+    """Cache key of the version counter of an user's feed, bumped by any write to the user's tasks."""
+    return 'tasks:version:%s:feed' % profile_id
+
+
+def get_versions(*keys):
+    """
+    Get version counters in one round trip.
+
+    Counters start from the current time so that an evicted counter never
+    comes back with a version that was already used for cached pages. A
+    missing counter is added, unless a concurrent request or write got
+    there first: they are all read back in one more round trip.
+    """
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if versions.get(key) is None]
+    if missing:
+        start = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, start, VERSION_TIMEOUT)
+        versions.update(cache.get_many(missing))
+    return tuple(versions[key] for key in keys)
+
+
+def get_day_version(profile_id, task_date):
+    """Get the version counter of an user's day."""
+    return get_versions(day_version_key(profile_id, task_date))[0]
+
+
+def get_listing_version(profile_id, task_date):
+    """Get the version of an user's day listing, repeating tasks of other days show up in it too."""
+    return '%s.%s' % get_versions(day_version_key(profile_id, task_date), series_version_key(profile_id))
+
+
+def bump_version(key):
+    """Bump a version counter."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), VERSION_TIMEOUT)
+
+
+def invalidate_day(profile_id, task_date):
+    """Bump the versions of an user's day and month, every page cached for them becomes unreachable."""
+    if profile_id is None or task_date is None:
+        return
+    bump_version(day_version_key(profile_id, task_date))
+    bump_version(month_version_key(profile_id, task_date))
+    bump_version(feed_version_key(profile_id))
+
+
+def invalidate_series(profile_id):
+    """Bump the version of an user's repeating tasks, every listing cached for the user becomes unreachable."""
+    if profile_id is None:
+        return
+    bump_version(series_version_key(profile_id))
+    bump_version(feed_version_key(profile_id))
+
+
+def count(name):
+    """Increase a shared cache counter."""
+    key = 'tasks:listing:stats:%s' % name
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def listing_cache_stats():
+    """Get listing cache hit, miss and stale counters."""
+    names = ('hit', 'miss', 'stale')
+    values = cache.get_many(['tasks:listing:stats:%s' % name for name in names])
+    return dict((name, values.get('tasks:listing:stats:%s' % name, 0)) for name in names)
+
+
+def listing_params_digest(request):
+    """Digest the query params that shape the listing page."""
+    params = sorted((key, request.GET.getlist(key)) for key in request.GET if key not in IGNORED_PARAMS)
+    return hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+
+
+def cached_listing(request, profile_id, task_date, response_format, render):
+    """
+    Return the cached listing of an user's day in ``response_format``, or ``render()`` it and cache it.
+
+    Pages are keyed by the listing version, so writes invalidate them through
+    ``invalidate_day`` and ``invalidate_series`` without scanning keys, and
+    by the format negotiated from the query and ``Accept``. While one request re-renders a
+    page, concurrent requests get the last rendered page if serving stale
+    pages is enabled.
+    """
+    version = get_listing_version(profile_id, task_date)
+    page_key = 'tasks:listing:%s:%s:%s:%s' % (profile_id, as_day(task_date), listing_params_digest(request),
+                                              response_format)
+    key = '%s:%s' % (page_key, version)
+
+    entry = cache.get(key)
+    if entry is not None:
+        count('hit')
+        return HttpResponse(entry[0], content_type=entry[1])
+
+    count('miss')
+    lock_key = '%s:lock' % key
+    locked = cache.add(lock_key, 1, REFRESH_LOCK_TIMEOUT)
+    if not locked and LISTING_SERVE_STALE:
+        entry = cache.get('%s:stale' % page_key)
+        if entry is not None:
+            count('stale')
+            return HttpResponse(entry[0], content_type=entry[1])
+
+    try:
+        response = render()
+        if response.status_code == 200:
+            entry = (response.content, response['Content-Type'])
+            cache.set(key, entry, LISTING_TIMEOUT)
+            if LISTING_SERVE_STALE:
+                cache.set('%s:stale' % page_key, entry, LISTING_STALE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return response
+
+
+def cached_calendar(profile_id, start, end, build):
+    """
+    Return the cached calendar of an user's days in ``[start, end]``, or ``build()`` it and cache it.
+
+    The key holds the version of every month the range touches and of the
+    user's repeating tasks, all read in one round trip: a write to any day of
+    a month drops the calendars of the whole month.
+    """
+    months = sorted(set(month_version_key(profile_id, start + timedelta(days=n))
+                        for n in range((end - start).days + 1)))
+    versions = get_versions(*months + [series_version_key(profile_id)])
+    key = 'tasks:calendar:%s:%s:%s:%s' % (profile_id, start, end,
+                                          hashlib.md5(repr(versions).encode('utf-8')).hexdigest())
+
+    calendar = cache.get(key)
+    if calendar is None:
+        calendar = build()
+        cache.set(key, calendar, CALENDAR_TIMEOUT)
+    return calendar
+
+
+def caching_chunks(key, chunks):
+    """Yield chunks, then cache their concatenation if it stays under ``FEED_CACHE_MAX_SIZE`` characters."""
+    kept = []
+    size = 0
+    for chunk in chunks:
+        if kept is not None:
+            size += len(chunk)
+            if size > FEED_CACHE_MAX_SIZE:
+                kept = None
+            else:
+                kept.append(chunk)
+        yield chunk
+    if kept is not None:
+        cache.set(key, ''.join(kept), FEED_TIMEOUT)
+
+
+def cached_feed(request, profile_id, today, content_type, render):
+    """
+    Answer ``304 Not Modified`` while an user's feed is unchanged, else its cached body or a streamed ``render()``.
+
+    The feed is keyed by the user's feed version and by ``today``, its
+    window rolls over every day. ``Last-Modified`` is the first time a
+    version was served. Feeds bigger than ``FEED_CACHE_MAX_SIZE`` are
+    rendered again every time they change for a poller, but never held
+    whole in memory.
+    """
+    key = 'tasks:feed:%s:%s:%s' % (profile_id, today, get_versions(feed_version_key(profile_id))[0])
+    etag = hashlib.md5(key.encode('utf-8')).hexdigest()
+    modified_key = '%s:modified' % key
+    cache.add(modified_key, int(time.time()), FEED_TIMEOUT)
+    last_modified = cache.get(modified_key) or int(time.time())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        body = cache.get(key)
+        if body is not None:
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(caching_chunks(key, render()), content_type=content_type)
+    if response.status_code in (200, 304):
+        response['ETag'] = quote_etag(etag)
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def listing_etag(request, profile_id, task_date):
+    """Validator of a listing, changes whenever the listing version changes."""
+    return hashlib.md5(('%s:%s:%s:%s:%s' % (
+        profile_id, as_day(task_date), get_listing_version(profile_id, task_date),
+        listing_params_digest(request), request.META.get('HTTP_ACCEPT', '')
+    )).encode('utf-8')).hexdigest()
+
+
+def task_etag(request, task_id, profile_id, task_date):
+    """Validator of a single task, its day version covers every write to it."""
+    return hashlib.md5(('%s:%s:%s:%s:%s' % (
+        task_id, profile_id, as_day(task_date), get_day_version(profile_id, task_date),
+        request.META.get('HTTP_ACCEPT', '')
+    )).encode('utf-8')).hexdigest()
+
+
+def conditional_response(request, etag, render):
+    """Answer ``304 Not Modified`` when the client holds ``etag``, else ``render()`` and tag the response."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+    if response.status_code in (200, 304):
+        response['ETag'] = quote_etag(etag)
+    return response
@@ -0,0 +1,71 @@
+"""Task export."""
+from __future__ import absolute_import
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from ..commons.datetime_utils import convert_to_string
+from .models import Task, task_time_text
+
+# Tasks fetched per query, bounds the memory an export holds whatever the task count
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('id', 'title', 'description', 'select_date', 'select_time', 'start_at', 'end_at', 'all_day',
+                 'location', 'notification', 'repeat', 'updated_at')
+
+
+def iter_tasks(profile_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield an user's live tasks as dicts of ``EXPORT_FIELDS``, in id order.
+
+    Django doesn't stream query results from PostgreSQL, every query is
+    fetched whole, so tasks are read in keyset chunks instead.
+    """
+    tasks = Task.objects \
+        .filter(user_id=profile_id, is_deleted=False) \
+        .order_by('id') \
+        .values('id', 'title', 'description', 'task_date', 'select_date', 'select_time', 'start_at', 'end_at',
+                'all_day', 'location', 'notification', 'repeat', 'updated_at')
+
+    last_id = 0
+    while True:
+        chunk = list(tasks.filter(id__gt=last_id)[:chunk_size])
+        for task in chunk:
+            task_date = task.pop('task_date')
+            if task_date is not None:
+                task['select_date'] = convert_to_string(task_date)
+            task['select_time'] = task_time_text(task['start_at'], task['end_at'], task['select_time'])
+            yield task
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
+
+
+def ndjson_lines(tasks):
+    """Serialize tasks to newline delimited JSON."""
+    encoder = DjangoJSONEncoder()
+    for task in tasks:
+        yield encoder.encode(task) + '\n'
+
+
+class LineBuffer(object):
+    """File-like object handing back what it's written, so ``csv.writer`` produces lines to stream."""
+
+    def write(self, value):
+        """Return the written value."""
+        return value
+
+
+def csv_lines(tasks):
+    """Serialize tasks to CSV, header first."""
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for task in tasks:
+        yield writer.writerow([
+            task[name].isoformat() if hasattr(task[name], 'isoformat') else task[name]
+            for name in EXPORT_FIELDS
+        ])
+
+
+# Export format to (serializer, content type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson', 'ndjson'),
+    'csv': (csv_lines, 'text/csv', 'csv'),
+}
@@ -0,0 +1,121 @@
+"""Task iCalendar feed."""
+from __future__ import absolute_import
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from ..commons.ical import escape_text, fold_line, format_date, format_date_time
+from ..account.models import UserProfile
+from .models import Task
+
+# Days before and after today a feed holds tasks of, repeating tasks started earlier are kept
+FEED_PAST_DAYS = getattr(settings, 'TASK_FEED_PAST_DAYS', 30)
+FEED_FUTURE_DAYS = getattr(settings, 'TASK_FEED_FUTURE_DAYS', 365)
+# Tasks fetched per query
+FEED_CHUNK_SIZE = 2000
+FEED_TOKEN_SALT = 'backend.task.feed'
+FEED_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+RRULE_FREQUENCIES = {
+    Task.REPEAT_DAILY: 'DAILY',
+    Task.REPEAT_WEEKLY: 'WEEKLY',
+    Task.REPEAT_MONTHLY: 'MONTHLY',
+    Task.REPEAT_YEARLY: 'YEARLY',
+}
+
+
+def new_feed_secret():
+    """Get a new random feed secret."""
+    return uuid.uuid4().hex
+
+
+def feed_token(profile_id, secret):
+    """Build the token of an user's feed, calendar apps can't send an api key."""
+    return signing.dumps([profile_id, secret], salt=FEED_TOKEN_SALT)
+
+
+def feed_profile_id(token):
+    """
+    Get the user profile id of a feed token, None when the token is invalid.
+
+    Tokens hold the feed secret of the profile, replacing it revokes every
+    token handed out, and users deactivated since lose their feed.
+    """
+    try:
+        values = signing.loads(token, salt=FEED_TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[0], int) or not values[1]:
+        return None
+    profile_id, secret = values
+    if not UserProfile.objects.filter(id=profile_id, feed_secret=secret, user__is_active=True).exists():
+        return None
+    return profile_id
+
+
+def feed_window(today):
+    """Get the ``(start, end)`` days of a feed served on ``today``."""
+    return today - timedelta(days=FEED_PAST_DAYS), today + timedelta(days=FEED_FUTURE_DAYS)
+
+
+def iter_feed_tasks(profile_id, start, end, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Yield the live tasks of an user a feed over ``[start, end]`` holds, as dicts, in id order.
+
+    Repeating tasks are yielded once with their ``task_date``, the feed
+    describes their occurrences with a RRULE.
+    """
+    tasks = Task.objects \
+        .filter(Q(task_date__range=(start, end)) | Q(task_date__lt=start, repeat__gt=Task.REPEAT_NONE),
+                user_id=profile_id, is_deleted=False) \
+        .order_by('id') \
+        .values('id', 'title', 'description', 'location', 'task_date', 'start_at', 'end_at', 'all_day',
+                'notification', 'repeat', 'updated_at')
+
+    last_id = 0
+    while True:
+        chunk = list(tasks.filter(id__gt=last_id)[:chunk_size])
+        for task in chunk:
+            yield task
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
+
+
+def event_lines(task):
+    """Get the content lines of a task's VEVENT."""
+    lines = [
+        'BEGIN:VEVENT',
+        'UID:task-%s@tododemo' % task['id'],
+        'DTSTAMP:%s' % format_date_time(task['updated_at']),
+    ]
+    if task['start_at'] is not None and not task['all_day']:
+        lines.append('DTSTART:%s' % format_date_time(task['start_at']))
+        if task['end_at'] is not None:
+            lines.append('DTEND:%s' % format_date_time(task['end_at']))
+    else:
+        lines.append('DTSTART;VALUE=DATE:%s' % format_date(task['task_date']))
+        lines.append('DTEND;VALUE=DATE:%s' % format_date(task['task_date'] + timedelta(days=1)))
+    lines.append('SUMMARY:%s' % escape_text(task['title'] or ''))
+    if task['description']:
+        lines.append('DESCRIPTION:%s' % escape_text(task['description']))
+    if task['location']:
+        lines.append('LOCATION:%s' % escape_text(task['location']))
+    if task['repeat'] in RRULE_FREQUENCIES:
+        lines.append('RRULE:FREQ=%s' % RRULE_FREQUENCIES[task['repeat']])
+    if task['notification']:
+        lines.extend(['BEGIN:VALARM', 'ACTION:DISPLAY', 'DESCRIPTION:%s' % escape_text(task['title'] or ''),
+                      'TRIGGER:PT0S', 'END:VALARM'])
+    lines.append('END:VEVENT')
+    return lines
+
+
+def ics_chunks(tasks):
+    """Serialize tasks to an iCalendar stream, one chunk per event."""
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//tododemo//Tasks//EN', 'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH', 'X-WR-CALNAME:Tasks'))
+    for task in tasks:
+        yield ''.join(fold_line(line) for line in event_lines(task))
+    yield fold_line('END:VCALENDAR')
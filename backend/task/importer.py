@@ -0,0 +1,283 @@
+"""Task import."""
+from __future__ import absolute_import
+import csv
+import io
+import json
+from datetime import datetime
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from ..commons.datetime_utils import format_time_range, get_timezone, parse_date
+from ..commons.fileprocessing import read_csv, read_lines
+from ..commons.ical import iter_events, parse_date_time, unescape_text
+from .models import Task, TaskImport, task_fingerprint, task_reminder_at, task_schedule, task_time_text
+from .signals import invalidate_tasks
+
+# Tasks inserted per query
+IMPORT_BATCH_SIZE = 1000
+# Errors kept on an import, later ones are only counted
+IMPORT_MAX_ERRORS = 100
+# Task columns an import writes, the search vector trigger fills the rest
+IMPORT_COLUMNS = ('user_id', 'title', 'description', 'location', 'all_day', 'notification', 'repeat', 'task_date',
+                  'select_date', 'select_time', 'start_at', 'end_at', 'is_deleted', 'fingerprint', 'reminder_at',
+                  'updated_at')
+# Columns an import leaves NULL, see ``copy_buffer``
+IMPORT_NULL_COLUMNS = ('start_at', 'end_at', 'fingerprint', 'reminder_at')
+COPY_SQL = 'COPY %s (%s) FROM STDIN WITH (FORMAT csv, FORCE_NULL (%s))' % (
+    Task._meta.db_table, ', '.join(IMPORT_COLUMNS), ', '.join(IMPORT_NULL_COLUMNS))
+
+# Largest value of the flag columns, PostgreSQL smallints
+FLAG_MAX = 32767
+# RRULE frequencies a repeating task supports, other rules are imported as single tasks
+REPEAT_FREQUENCIES = {
+    'DAILY': Task.REPEAT_DAILY,
+    'WEEKLY': Task.REPEAT_WEEKLY,
+    'MONTHLY': Task.REPEAT_MONTHLY,
+    'YEARLY': Task.REPEAT_YEARLY,
+}
+
+
+def as_flag(value, name):
+    """Read a CSV flag column, ValueError for values its column can't hold."""
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'false', 'no'):
+        return 0
+    if value in ('true', 'yes'):
+        return 1
+    try:
+        flag = int(value)
+    except ValueError:
+        flag = -1
+    if not 0 <= flag <= FLAG_MAX:
+        raise ValueError('Invalid %s %r' % (name, value))
+    return flag
+
+
+def as_repeat(value):
+    """Read the CSV repeat column, ValueError for unknown repeat codes."""
+    repeat = as_flag(value, 'repeat')
+    if repeat != Task.REPEAT_NONE and repeat not in REPEAT_FREQUENCIES.values():
+        raise ValueError('Invalid repeat %r' % value.strip())
+    return repeat
+
+
+def csv_rows(fileobj):
+    """
+    Read the tasks of a CSV file, with the columns of the task export.
+
+    Yield (line number, task fields) tuples, fields that can't be read are
+    reported as a ValueError in place of the task fields.
+    """
+    for line_number, row in read_csv(fileobj):
+        try:
+            select_date = (row.get('select_date') or '').strip()
+            yield line_number, {
+                'title': (row.get('title') or '').strip(),
+                'description': row.get('description') or '',
+                'location': row.get('location') or '',
+                'task_date': parse_date(select_date) if select_date else None,
+                'select_time': (row.get('select_time') or '').strip(),
+                'all_day': as_flag(row.get('all_day'), 'all_day'),
+                'notification': as_flag(row.get('notification'), 'notification'),
+                'repeat': as_repeat(row.get('repeat')),
+            }
+        except ValueError as e:
+            yield line_number, e
+
+
+def ics_rows(fileobj):
+    """
+    Read the tasks of an iCalendar file, one per VEVENT.
+
+    Yield (event number, task fields) tuples, like ``csv_rows``.
+    """
+    for number, event in enumerate(iter_events(read_lines(fileobj)), 1):
+        try:
+            yield number, event_fields(event)
+        except KeyError as e:
+            yield number, ValueError('Missing %s' % e.args[0])
+        except ValueError as e:
+            yield number, e
+
+
+def event_fields(event):
+    """Get the task fields of a VEVENT."""
+    start = parse_date_time(event['DTSTART'][1], event['DTSTART'][0])
+    end = parse_date_time(event['DTEND'][1], event['DTEND'][0]) if 'DTEND' in event else None
+    rule = dict(part.partition('=')[::2] for part in event.get('RRULE', ({}, ''))[1].upper().split(';') if part)
+
+    fields = {
+        'title': unescape_text(event.get('SUMMARY', ({}, ''))[1]).strip(),
+        'description': unescape_text(event.get('DESCRIPTION', ({}, ''))[1]),
+        'location': unescape_text(event.get('LOCATION', ({}, ''))[1]),
+        'notification': 1 if 'VALARM' in event['COMPONENTS'] else 0,
+        'repeat': REPEAT_FREQUENCIES.get(rule.get('FREQ'), Task.REPEAT_NONE),
+    }
+    if not isinstance(start, datetime):
+        fields.update(task_date=start, select_time='', all_day=1)
+        return fields
+
+    # Wall times of the days tasks are counted in, floating times are taken as is
+    if timezone.is_aware(start):
+        start = timezone.localtime(start, get_timezone())
+    if isinstance(end, datetime) and timezone.is_aware(end):
+        end = timezone.localtime(end, get_timezone())
+    end_time = end.time() if isinstance(end, datetime) and end != start else None
+    fields.update(task_date=start.date(), select_time=format_time_range(start.time(), end_time), all_day=0)
+    return fields
+
+
+# File format to its reader
+IMPORT_READERS = {
+    'csv': csv_rows,
+    'ics': ics_rows,
+}
+
+
+def copy_buffer(tasks):
+    """
+    Get the CSV ``COPY_SQL`` loads task rows from.
+
+    Every value but numbers is quoted, None as an empty string: ``COPY``
+    reads those as NULL in ``IMPORT_NULL_COLUMNS`` only, so that empty
+    texts stay empty.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for task in tasks:
+        writer.writerow([task[column] for column in IMPORT_COLUMNS])
+    buffer.seek(0)
+    return buffer
+
+
+def insert_tasks(tasks):
+    """
+    Insert task rows, dicts of ``IMPORT_COLUMNS``.
+
+    PostgreSQL gets them through a single ``COPY``, compiling an ORM insert
+    costs several times more than running it. Other databases get a
+    ``bulk_create``.
+    """
+    if connection.vendor != 'postgresql':
+        Task.objects.bulk_create([Task(**task) for task in tasks])
+        return
+
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(COPY_SQL, copy_buffer(tasks))
+
+
+class TaskImporter(object):
+    """
+    Insert the tasks read from a file in batches, reporting progress on its ``TaskImport``.
+
+    Tasks duplicating a live task of the user, or an earlier one of the file,
+    are skipped and reported like the rows that can't be read.
+    """
+
+    def __init__(self, task_import, batch_size=IMPORT_BATCH_SIZE):
+        """Initialize."""
+        self.task_import = task_import
+        self.profile_id = task_import.user_id
+        self.batch_size = batch_size
+        self.errors = json.loads(task_import.errors)
+
+    def run(self, fileobj):
+        """Import every task of the file."""
+        batch = []
+        for number, fields in IMPORT_READERS[self.task_import.file_format](fileobj):
+            self.task_import.rows_processed += 1
+            try:
+                if isinstance(fields, Exception):
+                    raise fields
+                batch.append((number, self.build_task(fields)))
+            except ValueError as e:
+                self.add_error(number, str(e))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+
+    def build_task(self, fields):
+        """Build the row of a task of the user, with the values ``Task.set_schedule`` and ``Task.save`` would store."""
+        if not fields['title']:
+            raise ValueError('Missing title')
+        if fields['task_date'] is None:
+            raise ValueError('Missing date')
+        start_at, end_at, select_time = task_schedule(fields['task_date'], fields['select_time'][:255])
+        title = fields['title'][:255]
+        return {
+            'user_id': self.profile_id,
+            'title': title,
+            'description': fields['description'][:255],
+            'location': fields['location'][:255],
+            'all_day': fields['all_day'],
+            'notification': fields['notification'],
+            'repeat': fields['repeat'],
+            'task_date': fields['task_date'],
+            'select_date': '',
+            'select_time': select_time,
+            'start_at': start_at,
+            'end_at': end_at,
+            'is_deleted': False,
+            'fingerprint': task_fingerprint(self.profile_id, title, fields['task_date'],
+                                            task_time_text(start_at, end_at, select_time)),
+            'reminder_at': task_reminder_at(fields['task_date'], start_at, fields['all_day'], fields['notification'],
+                                            fields['repeat']),
+            'updated_at': None,
+        }
+
+    def add_error(self, number, message):
+        """Count an error, keep the first ones."""
+        self.task_import.errors_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({'row': number, 'message': message})
+
+    def flush(self, batch):
+        """Insert a batch of tasks and save the progress."""
+        fingerprints = [task['fingerprint'] for _, task in batch if task['fingerprint']]
+        taken = set(Task.objects.filter(user_id=self.profile_id, fingerprint__in=fingerprints, is_deleted=False)
+                    .values_list('fingerprint', flat=True)) if fingerprints else set()
+        tasks = []
+        now = timezone.now()
+        for number, task in batch:
+            if task['fingerprint'] in taken:
+                self.add_error(number, 'A same task is already in your list')
+                continue
+            if task['fingerprint']:
+                taken.add(task['fingerprint'])
+            task['updated_at'] = now
+            tasks.append((number, task))
+
+        try:
+            with transaction.atomic():
+                insert_tasks([task for _, task in tasks])
+        except IntegrityError:
+            # A same task was created meanwhile, find it row by row
+            tasks = self.insert_one_by_one(tasks)
+        self.task_import.rows_imported += len(tasks)
+
+        # Bulk inserts skip the model signals, invalidate the cached days here
+        if tasks:
+            invalidate_tasks(self.profile_id, set(task['task_date'] for _, task in tasks),
+                             any(task['repeat'] for _, task in tasks))
+
+        self.save_progress()
+
+    def insert_one_by_one(self, tasks):
+        """Insert tasks one at a time, return the inserted ones."""
+        inserted = []
+        for number, task in tasks:
+            try:
+                with transaction.atomic():
+                    Task(**task).save()
+                inserted.append((number, task))
+            except IntegrityError:
+                self.add_error(number, 'A same task is already in your list')
+        return inserted
+
+    def save_progress(self):
+        """Save the counters and errors, the status endpoint reads them while the import runs."""
+        task_import = self.task_import
+        task_import.errors = json.dumps(self.errors)
+        TaskImport.objects.filter(id=task_import.id).update(
+            rows_processed=task_import.rows_processed, rows_imported=task_import.rows_imported,
+            errors_count=task_import.errors_count, errors=task_import.errors)
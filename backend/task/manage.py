@@ -1,5 +1,7 @@
 """Tasks manager."""
+from django.db import connection
 from ..commons.utils import null_or_number
+from .models import Task
 
 
 def validate_restaurant_filters(limit, offset):
@@ -13,3 +15,17 @@ def validate_restaurant_filters(limit, offset):
         return False
 
     return True
+
+
+def next_task_ids(count):
+    """
+    Reserve primary keys for tasks created with ``bulk_create``.
+
+    :param count: how many ids to draw from the task id sequence.
+    """
+    if not count:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                       [Task._meta.db_table, count])
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,50 @@
+"""Backfill the next reminders of tasks."""
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ....commons.datetime_utils import get_current_date
+from ...models import Task, task_reminder_at
+
+
+class Command(BaseCommand):
+    """Compute ``reminder_at`` of the tasks saved before reminders existed, one short transaction per chunk."""
+
+    help = 'Backfill reminder_at of live tasks with a notification, in chunks.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='How many tasks to update per transaction.')
+        parser.add_argument('--after-id', type=int, default=0,
+                            help='Resume after this task id, as printed by an interrupted run.')
+
+    def handle(self, *args, **options):
+        """Update the tasks chunk by chunk, in id order."""
+        # Past single tasks have no reminder left
+        pending = Task.objects \
+            .filter(Q(task_date__gte=get_current_date()) | Q(repeat__gt=Task.REPEAT_NONE),
+                    notification__gt=0, is_deleted=False, reminder_at__isnull=True) \
+            .order_by('id') \
+            .values('id', 'task_date', 'start_at', 'all_day', 'notification', 'repeat', 'reminder_fired_at')
+
+        last_id = options['after_id']
+        total = 0
+        while True:
+            with transaction.atomic():
+                tasks = list(pending.filter(id__gt=last_id)[:options['chunk_size']])
+                if not tasks:
+                    break
+                now = timezone.now()
+                for task in tasks:
+                    reminder_at = task_reminder_at(task['task_date'], task['start_at'], task['all_day'],
+                                                   task['notification'], task['repeat'], now,
+                                                   fired_at=task['reminder_fired_at'])
+                    if reminder_at is not None:
+                        Task.objects.filter(id=task['id'], reminder_at__isnull=True).update(reminder_at=reminder_at)
+            last_id = tasks[-1]['id']
+            total += len(tasks)
+            self.stdout.write('Checked %s tasks, up to id %s' % (total, last_id))
+
+        self.stdout.write('Done, %s tasks checked.' % total)
@@ -0,0 +1,80 @@
+"""Backfill the task start and end timestamps."""
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from ...models import Task, task_fingerprint, task_schedule, task_time_text
+
+
+class Command(BaseCommand):
+    """
+    Parse the legacy ``select_date``/``select_time`` texts of existing tasks, one short transaction per chunk.
+
+    Times are anchored in ``DEFAULT_TIMEZONE`` like every ``as_datetime`` timestamp.
+    """
+
+    help = 'Backfill start_at and end_at of tasks from their select_time text in chunks.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='How many tasks to update per transaction.')
+        parser.add_argument('--after-id', type=int, default=0,
+                            help='Resume after this task id, as printed by an interrupted run.')
+
+    def handle(self, *args, **options):
+        """Update the tasks chunk by chunk, in id order."""
+        # Rows still holding a legacy text, done rows drop out so a rerun only walks what's left
+        pending = Task.objects \
+            .filter(Q(select_date__gt='') | Q(select_time__gt='')) \
+            .order_by('id') \
+            .values('id', 'user_id', 'title', 'task_date', 'select_date', 'select_time', 'is_deleted')
+
+        last_id = options['after_id']
+        total = 0
+        while True:
+            with transaction.atomic():
+                tasks = list(pending.filter(id__gt=last_id)[:options['chunk_size']])
+                if not tasks:
+                    break
+                self.backfill(tasks)
+            last_id = tasks[-1]['id']
+            total += len(tasks)
+            self.stdout.write('Updated %s tasks, up to id %s' % (total, last_id))
+
+        self.stdout.write('Done, %s tasks updated.' % total)
+
+    def backfill(self, tasks):
+        """
+        Store the parsed timestamps of tasks and fingerprint them from their derived texts.
+
+        A fingerprint already held by another live task is left unset, like
+        migration ``0007_task_fingerprint`` did for the duplicates it found.
+        """
+        for task in tasks:
+            task['start_at'], task['end_at'], task['select_time'] = \
+                task_schedule(task['task_date'], task['select_time'])
+            if task['task_date'] is not None:
+                task['select_date'] = ''
+            task['fingerprint'] = task_fingerprint(task['user_id'], task['title'], task['task_date'],
+                                                   task_time_text(task['start_at'], task['end_at'],
+                                                                  task['select_time']))
+
+        ids = [task['id'] for task in tasks]
+        taken = set(Task.objects
+                    .filter(fingerprint__in=[task['fingerprint'] for task in tasks if task['fingerprint']],
+                            is_deleted=False)
+                    .exclude(id__in=ids)
+                    .values_list('fingerprint', flat=True))
+        # Release the chunk's fingerprints first, rows may swap them
+        Task.objects.filter(id__in=ids).update(fingerprint=None)
+
+        for task in tasks:
+            if not task['is_deleted'] and task['fingerprint']:
+                if task['fingerprint'] in taken:
+                    task['fingerprint'] = None
+                else:
+                    taken.add(task['fingerprint'])
+            Task.objects.filter(id=task['id']).update(
+                start_at=task['start_at'], end_at=task['end_at'], select_date=task['select_date'],
+                select_time=task['select_time'], fingerprint=task['fingerprint'])
@@ -0,0 +1,42 @@
+"""Backfill the task search vectors."""
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from ...models import Task
+
+
+class Command(BaseCommand):
+    """Fill ``search_vector`` of existing tasks, one short transaction per chunk."""
+
+    help = 'Backfill the full text search vector of tasks in chunks.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='How many tasks to update per transaction.')
+        parser.add_argument('--all', action='store_true', default=False,
+                            help='Rebuild every vector, not only the missing ones.')
+
+    def handle(self, *args, **options):
+        """Update the tasks chunk by chunk, in id order."""
+        table = connection.ops.quote_name(Task._meta.db_table)
+        missing_only = '' if options['all'] else 'AND search_vector IS NULL'
+        sql = """
+            UPDATE {table} SET search_vector = task_search_vector(title, description, location)
+            WHERE id IN (SELECT id FROM {table} WHERE id > %s {missing_only} ORDER BY id LIMIT %s)
+            RETURNING id
+        """.format(table=table, missing_only=missing_only)
+
+        last_id = 0
+        total = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [last_id, options['chunk_size']])
+                ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+            total += len(ids)
+            self.stdout.write('Updated %s tasks, up to id %s' % (total, last_id))
+
+        self.stdout.write('Done, %s tasks updated.' % total)
@@ -0,0 +1,71 @@
+"""Benchmark the date helpers of the task endpoints."""
+from __future__ import absolute_import
+import timeit
+from datetime import date, datetime, timedelta
+import pytz
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ....commons import datetime_utils
+
+
+def strptime_date(value):
+    """``convert_to_date`` before the fast path."""
+    return datetime.strptime(value, '%B %d, %Y')
+
+
+def strftime_date(value):
+    """``convert_to_string`` before the fast path."""
+    return value.strftime('%B %d, %Y')
+
+
+def normalized_current_date():
+    """``get_current_date`` before the fast path."""
+    nytz = pytz.timezone(settings.DEFAULT_TIMEZONE)
+    u = datetime.utcnow().replace(tzinfo=pytz.utc)
+    return nytz.normalize(u).date()
+
+
+class Command(BaseCommand):
+    """Time the memoized date helpers against the strptime/strftime/pytz calls they replace."""
+
+    help = 'Micro-benchmark the commons.datetime_utils fast paths.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--number', type=int, default=100000,
+                            help='Calls per measure.')
+        parser.add_argument('--days', type=int, default=60,
+                            help='Distinct dates the calls cycle through, like a month view and its neighbours.')
+
+    def handle(self, *args, **options):
+        """Check the fast paths give the same results, then time them."""
+        number = options['number']
+        days = [date(2016, 1, 1) + timedelta(days=n) for n in range(options['days'])]
+        texts = [strftime_date(day) for day in days]
+
+        for day, text in zip(days, texts):
+            if datetime_utils.convert_to_date(text) != strptime_date(text) \
+                    or datetime_utils.convert_to_string(day) != text:
+                raise CommandError('The fast path disagrees with strptime/strftime on %s' % text)
+
+        def cycle(func, values):
+            values = values * (number // len(values) + 1)
+            return lambda: [func(value) for value in values[:number]]
+
+        measures = [
+            ('parse', 'strptime', cycle(strptime_date, texts)),
+            ('parse', 'hand-rolled, no cache', cycle(datetime_utils.parse_date.__wrapped__, texts)),
+            ('parse', 'hand-rolled, cached', cycle(datetime_utils.convert_to_date, texts)),
+            ('format', 'strftime', cycle(strftime_date, days)),
+            ('format', 'fast path', cycle(datetime_utils.convert_to_string, days)),
+            ('today', 'pytz.timezone + normalize', lambda: [normalized_current_date() for _ in range(number)]),
+            ('today', 'cached timezone', lambda: [datetime_utils.get_current_date() for _ in range(number)]),
+        ]
+
+        baselines = {}
+        self.stdout.write('%-8s %-28s %12s %10s' % ('helper', 'implementation', 'usec/call', 'speedup'))
+        for helper, name, run in measures:
+            seconds = min(timeit.repeat(run, number=1, repeat=3))
+            baselines.setdefault(helper, seconds)
+            self.stdout.write('%-8s %-28s %12.3f %9.1fx' % (
+                helper, name, seconds / number * 1e6, baselines[helper] / seconds))
@@ -0,0 +1,103 @@
+"""Benchmark the serialization of task listings."""
+from __future__ import absolute_import
+import json
+import timeit
+from datetime import date, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.test import RequestFactory
+from django.utils import timezone
+from ...api import TaskResource
+from ...models import Task, as_datetime
+from ....account.models import UserProfile
+
+
+class Command(BaseCommand):
+    """Time the ``values()`` list fast path against a tastypie bundle per task, per row."""
+
+    help = 'Micro-benchmark the per row cost of serializing task listings, bundles against the lean path.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Tasks per listing.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Measures per implementation, the best one is kept.')
+
+    def handle(self, *args, **options):
+        """Check both paths give the same output, then time them on rows built in memory, the database left out."""
+        rows = options['rows']
+        resource = TaskResource(api_name='v1')
+        request = RequestFactory().get('/api/v1/tasks/listing/')
+        profile = UserProfile(id=1)
+        names = [field.attname for field in Task._meta.concrete_fields]
+        values = [self.task_values(number, profile.id) for number in range(rows)]
+
+        def instances():
+            tasks = [Task.from_db(DEFAULT_DB_ALIAS, names, [task[name] for name in names]) for task in values]
+            for task in tasks:
+                # As prefetched by the queryset of the resource
+                task.user = profile
+            return tasks
+
+        def dicts():
+            return [dict((column, task[column]) for column in resource.lean_columns) for task in values]
+
+        def bundles(tasks):
+            return [resource.full_dehydrate(resource.build_bundle(obj=task, request=request), for_list=True)
+                    for task in tasks]
+
+        def lean(tasks):
+            return [resource.lean_dehydrate(task) for task in tasks]
+
+        def serialize(objects):
+            return resource.serialize(request, {'objects': objects}, 'application/json')
+
+        if json.loads(serialize(bundles(instances()))) != json.loads(serialize(lean(dicts()))):
+            raise CommandError('The lean path disagrees with the bundles.')
+
+        tasks, task_dicts = instances(), dicts()
+        bundled, leaned = bundles(tasks), lean(task_dicts)
+        measures = [
+            ('rows', 'model instances', instances),
+            ('rows', 'values() dicts', dicts),
+            ('dehydrate', 'bundles', lambda: bundles(tasks)),
+            ('dehydrate', 'lean', lambda: lean(task_dicts)),
+            ('json', 'bundles', lambda: serialize(bundled)),
+            ('json', 'lean', lambda: serialize(leaned)),
+            ('total', 'bundles', lambda: serialize(bundles(instances()))),
+            ('total', 'lean', lambda: serialize(lean(dicts()))),
+        ]
+
+        baselines = {}
+        self.stdout.write('%-10s %-18s %12s %10s' % ('stage', 'implementation', 'usec/row', 'speedup'))
+        for stage, name, run in measures:
+            seconds = min(timeit.repeat(run, number=1, repeat=options['repeat']))
+            baselines.setdefault(stage, seconds)
+            self.stdout.write('%-10s %-18s %12.3f %9.1fx' % (
+                stage, name, seconds / rows * 1e6, baselines[stage] / seconds))
+
+    def task_values(self, number, profile_id):
+        """Column values of a task as read from the database, a mix of timed, untimed and empty fields."""
+        task_date = date(2016, 6, 1) + timedelta(days=number % 30)
+        timed = number % 4 != 0
+        start_at = as_datetime(task_date, time(number % 24)) if timed else None
+        values = dict((field.attname, None) for field in Task._meta.concrete_fields)
+        values.update({
+            'id': number + 1,
+            'user_id': profile_id,
+            'title': 'Task %s' % number,
+            'description': 'Description of task %s' % number if number % 2 else '',
+            'select_date': '',
+            'select_time': '' if timed else 'Some time',
+            'start_at': start_at,
+            'end_at': start_at + timedelta(hours=1) if timed else None,
+            'all_day': 0,
+            'location': None if number % 3 else 'Office',
+            'notification': number % 2,
+            'repeat': Task.REPEAT_WEEKLY if number % 10 == 0 else Task.REPEAT_NONE,
+            'is_deleted': False,
+            'task_date': task_date,
+            'updated_at': timezone.now(),
+        })
+        return values
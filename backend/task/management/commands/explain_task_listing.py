@@ -0,0 +1,84 @@
+"""Explain the task listing query."""
+from __future__ import absolute_import
+import json
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from ...api import TaskResource
+from ...models import Task
+from ....account.models import UserProfile
+from ....commons.datetime_utils import convert_to_string
+
+# Index serving the listing, see migration ``0002_task_listing_index``
+LISTING_INDEX = 'task_task_listing_idx'
+
+
+class Command(BaseCommand):
+    """EXPLAIN the /tasks/listing/ query and fail unless the listing index serves it."""
+
+    help = 'EXPLAIN the task listing query and fail unless it scans task_task_listing_idx.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--profile', type=int, default=None,
+                            help='User profile id to explain the listing for, defaults to the first profile.')
+        parser.add_argument('--date', default=None,
+                            help="Listing date with '%%B %%d, %%Y' format, defaults to today.")
+        parser.add_argument('--allow-seqscan', action='store_true', default=False,
+                            help='Keep enable_seqscan on, small tables will then plan a seq scan anyway.')
+
+    def handle(self, *args, **options):
+        """Run EXPLAIN on the listing query."""
+        profiles = UserProfile.objects.select_related('user')
+        if options['profile']:
+            profiles = profiles.filter(id=options['profile'])
+        profile = profiles.first()
+        if profile is None or profile.user is None:
+            raise CommandError('No user profile to explain the listing for.')
+
+        request = RequestFactory().get('/api/v1/tasks/listing/', {
+            'date': options['date'] or convert_to_string(date.today())
+        })
+        request.user = profile.user
+
+        resource = TaskResource()
+        objects = resource.apply_sorting(resource.apply_filters(request, {}), options=request.GET)
+        sql, params = objects.query.sql_with_params()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not options['allow_seqscan']:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            tables = self.with_partitions(cursor, Task._meta.db_table)
+            listing_indexes = self.with_partitions(cursor, LISTING_INDEX)
+        if not isinstance(plan, list):
+            plan = json.loads(plan)
+
+        self.stdout.write(json.dumps(plan, indent=2))
+
+        nodes = list(self.iter_nodes(plan[0]['Plan']))
+        if any(node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in tables for node in nodes):
+            raise CommandError('The task listing query runs a sequential scan on %s.' % Task._meta.db_table)
+        for node in nodes:
+            if node.get('Index Name'):
+                self.stdout.write('%s using %s' % (node['Node Type'], node['Index Name']))
+        # With sequential scans off any index passes, the user_id one included
+        if not any(node.get('Index Name') in listing_indexes for node in nodes):
+            raise CommandError('The task listing query does not use %s.' % LISTING_INDEX)
+
+    def with_partitions(self, cursor, relation):
+        """Get the names of a table or index and of its partitions, plans name the partitions they scan."""
+        cursor.execute("""
+            SELECT relname FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+        """, [relation])
+        return set(row[0] for row in cursor.fetchall()) | {relation}
+
+    def iter_nodes(self, node):
+        """Walk the plan tree."""
+        yield node
+        for child in node.get('Plans', []):
+            for sub_node in self.iter_nodes(child):
+                yield sub_node
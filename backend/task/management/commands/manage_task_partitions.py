@@ -0,0 +1,26 @@
+"""Create and archive the monthly partitions of the task table."""
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand, CommandError
+from ....commons.datetime_utils import get_current_date
+from ...partitions import PARTITION_ARCHIVE_MONTHS, PARTITION_MONTHS_AHEAD, is_partitioned, manage_partitions
+
+
+class Command(BaseCommand):
+    """Run the daily partition upkeep by hand, like right after migration ``0012_task_partitions``."""
+
+    help = 'Create the task partitions of the coming months, split the default partition and detach old months.'
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+                            help='Months after the current one to create partitions for.')
+        parser.add_argument('--archive-months', type=int, default=PARTITION_ARCHIVE_MONTHS,
+                            help='Detach the partitions of months older than this, 0 to keep them all.')
+
+    def handle(self, *args, **options):
+        """Create and archive partitions, one transaction each."""
+        if not is_partitioned():
+            raise CommandError('The task table is not partitioned, that needs PostgreSQL 13 or later.')
+        created, archived = manage_partitions(get_current_date(), options['months_ahead'],
+                                              options['archive_months'], log=self.stdout.write)
+        self.stdout.write('Done, %s partitions created and %s archived.' % (len(created), len(archived)))
@@ -0,0 +1,18 @@
+"""Show task listing cache counters."""
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+from ...cache import listing_cache_stats
+
+
+class Command(BaseCommand):
+    """Print hit, miss and stale counters of the /tasks/listing/ cache."""
+
+    help = 'Show hit, miss and stale counters of the task listing cache.'
+
+    def handle(self, *args, **options):
+        """Print the counters."""
+        stats = listing_cache_stats()
+        lookups = stats['hit'] + stats['miss']
+        for name in ('hit', 'miss', 'stale'):
+            self.stdout.write('%s: %s' % (name, stats[name]))
+        self.stdout.write('hit ratio: %.2f%%' % (100.0 * stats['hit'] / lookups if lookups else 0))
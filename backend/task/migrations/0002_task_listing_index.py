@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0001_initial'),
+    ]
+
+    operations = [
+        # Serves the day listing (user_id, task_date) in (title, id) order without a sort step.
+        migrations.RunSQL(
+            'CREATE INDEX task_task_listing_idx ON task_task (user_id, task_date, title, id) '
+            'WHERE is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_listing_idx',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0003_task_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE EXTENSION IF NOT EXISTS btree_gin',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'ALTER TABLE task_task ADD COLUMN search_vector tsvector',
+            'ALTER TABLE task_task DROP COLUMN search_vector',
+        ),
+        # Shared by the trigger and the backfill_task_search_vector command
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION task_search_vector(title text, description text, location text)
+            RETURNS tsvector AS $$
+                SELECT setweight(to_tsvector('pg_catalog.english', coalesce(title, '')), 'A') ||
+                       setweight(to_tsvector('pg_catalog.english', coalesce(description, '')), 'B') ||
+                       setweight(to_tsvector('pg_catalog.english', coalesce(location, '')), 'C')
+            $$ LANGUAGE sql IMMUTABLE;
+
+            CREATE FUNCTION task_search_vector_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := task_search_vector(NEW.title, NEW.description, NEW.location);
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER task_task_search_vector_update
+                BEFORE INSERT OR UPDATE OF title, description, location ON task_task
+                FOR EACH ROW EXECUTE PROCEDURE task_search_vector_trigger();
+            """,
+            """
+            DROP TRIGGER IF EXISTS task_task_search_vector_update ON task_task;
+            DROP FUNCTION IF EXISTS task_search_vector_trigger();
+            DROP FUNCTION IF EXISTS task_search_vector(text, text, text);
+            """,
+        ),
+        # Scoped by user so a search only walks the posting lists of one user's live tasks
+        migrations.RunSQL(
+            'CREATE INDEX task_task_search_vector_idx ON task_task USING gin (user_id, search_vector) '
+            'WHERE is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_search_vector_idx',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0004_task_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            migrations.RunSQL.noop,
+        ),
+        # Serves the title typeahead: lower(title) LIKE 'prefix%' within one user's live tasks
+        migrations.RunSQL(
+            'CREATE INDEX task_task_title_trgm_idx ON task_task USING gin (user_id, lower(title) gin_trgm_ops) '
+            'WHERE is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_title_trgm_idx',
+        ),
+    ]
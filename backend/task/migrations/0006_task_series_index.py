@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0005_task_title_trigram_index'),
+    ]
+
+    operations = [
+        # Finds an user's live repeating tasks, the candidates of every recurrence expansion
+        migrations.RunSQL(
+            'CREATE INDEX task_task_series_idx ON task_task (user_id, task_date) '
+            'WHERE repeat > 0 AND is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_series_idx',
+        ),
+    ]
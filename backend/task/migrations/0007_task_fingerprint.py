@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Mirrors ``task_fingerprint``, when an user already holds duplicated live
+# tasks only the oldest one gets the fingerprint
+BACKFILL_FINGERPRINT = r"""
+UPDATE task_task t SET fingerprint = f.fingerprint
+FROM (
+    SELECT id, is_deleted, fingerprint,
+           row_number() OVER (PARTITION BY fingerprint, is_deleted ORDER BY id) AS position
+    FROM (
+        SELECT id, is_deleted,
+               CASE WHEN user_id IS NOT NULL AND title <> '' AND task_date IS NOT NULL AND select_time <> ''
+                    THEN md5(user_id::text || '|' || title || '|' || to_char(task_date, 'YYYY-MM-DD')
+                             || '|' || select_time)
+               END AS fingerprint
+        FROM (
+            SELECT id, user_id, task_date, is_deleted,
+                   lower(btrim(regexp_replace(coalesce(title, ''), '\s+', ' ', 'g'))) AS title,
+                   lower(btrim(regexp_replace(coalesce(select_time, ''), '\s+', ' ', 'g'))) AS select_time
+            FROM task_task
+        ) normalized
+    ) fingerprinted
+) f
+WHERE t.id = f.id AND f.fingerprint IS NOT NULL AND (f.position = 1 OR f.is_deleted)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0006_task_series_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_FINGERPRINT, migrations.RunSQL.noop),
+        # Duplicate checks probe it, and it rejects the duplicates racing past them
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX task_task_fingerprint_uniq ON task_task (fingerprint) '
+            'WHERE is_deleted = false AND fingerprint IS NOT NULL',
+            'DROP INDEX IF EXISTS task_task_fingerprint_uniq',
+        ),
+    ]
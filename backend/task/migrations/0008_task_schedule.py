@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0007_task_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='end_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='start_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='all_day',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='notification',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='repeat',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, null=True),
+        ),
+        # Serves time range queries over an user's live tasks
+        migrations.RunSQL(
+            'CREATE INDEX task_task_start_at_idx ON task_task (user_id, start_at) '
+            'WHERE is_deleted = false AND start_at IS NOT NULL',
+            'DROP INDEX IF EXISTS task_task_start_at_idx',
+        ),
+    ]
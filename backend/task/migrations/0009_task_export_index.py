@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0008_task_schedule'),
+    ]
+
+    operations = [
+        # Walks an user's live tasks in id order, the chunks of an export
+        migrations.RunSQL(
+            'CREATE INDEX task_task_export_idx ON task_task (user_id, id) WHERE is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_export_idx',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0010_task_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='reminder_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        # Pending reminders only, the due ones are claimed from its head every minute
+        migrations.RunSQL(
+            'CREATE INDEX task_task_reminder_at_idx ON task_task (reminder_at) '
+            'WHERE reminder_at IS NOT NULL AND is_deleted = false',
+            'DROP INDEX IF EXISTS task_task_reminder_at_idx',
+        ),
+    ]
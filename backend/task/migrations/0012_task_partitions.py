@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+from datetime import date
+
+from django.db import migrations
+
+# Declarative partitioning, with row triggers cloned to the partitions
+PARTITIONING_MIN_VERSION = 130000
+
+
+def partition_tasks(apps, schema_editor):
+    """
+    Turn ``task_task`` into a table partitioned by monthly ``task_date`` ranges.
+
+    Every month holding rows gets its partition here and rows are copied
+    straight into them, the default partition only keeps the tasks without a
+    day. The copy holds an exclusive lock on the table, run it when the app
+    is down. ``manage_task_partitions`` creates the coming months. Unique
+    indexes get ``task_date``, the partition key, and the primary key
+    becomes a plain index on ``id``: ids are only unique because they all
+    come from the same sequence, and lookups by id alone probe the index of
+    every partition. Skipped on other databases and on PostgreSQL releases
+    older than 13, ``compose/postgres`` runs 13.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or connection.pg_version < PARTITIONING_MIN_VERSION:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'task_task'::regclass")
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        # Definitions are read before the rename, they name the new table
+        cursor.execute("""
+            SELECT pg_get_indexdef(indexrelid), indisprimary, indisunique FROM pg_index
+            WHERE indrelid = 'task_task'::regclass
+        """)
+        indexes = cursor.fetchall()
+        cursor.execute("""
+            SELECT pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = 'task_task'::regclass AND NOT tgisinternal
+        """)
+        triggers = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = 'task_task'::regclass AND contype = 'f'
+        """)
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute('ALTER TABLE task_task RENAME TO task_task_heap')
+        cursor.execute("""
+            CREATE TABLE task_task (LIKE task_task_heap INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (task_date)
+        """)
+        cursor.execute('CREATE TABLE task_task_default PARTITION OF task_task DEFAULT')
+        cursor.execute("""
+            SELECT DISTINCT date_trunc('month', task_date)::date FROM task_task_heap WHERE task_date IS NOT NULL
+        """)
+        for month, in cursor.fetchall():
+            next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+            cursor.execute('CREATE TABLE task_task_p%04d%02d PARTITION OF task_task FOR VALUES FROM (%%s) TO (%%s)'
+                           % (month.year, month.month), [month, next_month])
+        cursor.execute('INSERT INTO task_task SELECT * FROM task_task_heap')
+        # The id sequence would go with the table owning it
+        cursor.execute("SELECT pg_get_serial_sequence('task_task_heap', 'id')")
+        sequence = cursor.fetchone()[0]
+        cursor.execute('ALTER SEQUENCE %s OWNED BY task_task.id' % sequence)
+        cursor.execute('DROP TABLE task_task_heap')
+
+        # Indexes and triggers are built once the rows are in
+        for indexdef, primary, unique in indexes:
+            if primary:
+                cursor.execute('CREATE INDEX task_task_id_idx ON task_task (id)')
+                continue
+            if unique:
+                indexdef = re.sub(r'USING (\w+) \(([^)]*)\)', r'USING \1 (\2, task_date)', indexdef, count=1)
+            cursor.execute(indexdef)
+        for triggerdef in triggers:
+            cursor.execute(triggerdef)
+        for name, definition in foreign_keys:
+            cursor.execute('ALTER TABLE task_task ADD CONSTRAINT %s %s' % (name, definition))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0011_task_reminder'),
+    ]
+
+    operations = [
+        # A partitioned table works for every query of the app, leave it as is when going back
+        migrations.RunPython(partition_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0012_task_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        # Tasks were last updated when they went to the trash
+        migrations.RunSQL(
+            'UPDATE task_task SET deleted_at = updated_at WHERE is_deleted = true',
+            migrations.RunSQL.noop,
+        ),
+        # Serves an user's trash, most recently deleted first. Like the purge index it only holds
+        # deleted rows, the live task indexes never do
+        migrations.RunSQL(
+            'CREATE INDEX task_task_trash_idx ON task_task (user_id, deleted_at, id) WHERE is_deleted = true',
+            'DROP INDEX IF EXISTS task_task_trash_idx',
+        ),
+        # Serves the purge, walking the trash of every user from the oldest deletes
+        migrations.RunSQL(
+            'CREATE INDEX task_task_purge_idx ON task_task (deleted_at, id) WHERE is_deleted = true',
+            'DROP INDEX IF EXISTS task_task_purge_idx',
+        ),
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Tasks stamped per transaction
+BACKFILL_BATCH_SIZE = 1000
+
+
+def stamp_tasks(apps, schema_editor):
+    """Stamp the existing tasks, one short transaction per range of ids, the trigger sets the value."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT max(id) FROM task_task')
+        max_id = cursor.fetchone()[0] or 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE task_task SET change_txid = txid_current() WHERE id > %s AND id <= %s AND change_txid IS NULL',
+                           [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    # The backfill commits range by range
+    atomic = False
+
+    dependencies = [
+        ('task', '0013_task_trash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='change_txid',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        # Every write stamps the rows with the id of its transaction, whatever the value the client sent
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION task_change_txid_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.change_txid := txid_current();
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER task_task_change_txid_update
+                BEFORE INSERT OR UPDATE ON task_task
+                FOR EACH ROW EXECUTE PROCEDURE task_change_txid_trigger();
+            """,
+            """
+            DROP TRIGGER IF EXISTS task_task_change_txid_update ON task_task;
+            DROP FUNCTION IF EXISTS task_change_txid_trigger();
+            """,
+        ),
+        migrations.RunPython(stamp_tasks, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([('user', 'change_txid', 'id')]),
+        ),
+    ]
@@ -1,35 +1,286 @@
 """Task model."""
+import hashlib
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from django.conf import settings
 from django.db import models
 from ..account.models import UserProfile
+from ..commons.datetime_utils import format_time_range, get_timezone, parse_time_range
+from ..commons.full_text_search import SearchManagerExt
 from django.utils import timezone
 import os
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+# Distinct timestamps converted from and to times of day kept in memory
+SCHEDULE_CACHE_SIZE = 4096
+# How long before a task starts its reminder fires
+REMINDER_LEAD = timedelta(minutes=getattr(settings, 'TASK_REMINDER_LEAD_MINUTES', 0))
+# Time of day the reminders of tasks without a start time fire at
+REMINDER_DAY_TIME = time(getattr(settings, 'TASK_REMINDER_DAY_HOUR', 9))
+# Days searched for the next occurrence of a repeating task, wider spans only for sparser series
+REMINDER_SEARCH_SPANS = (8, 62, 366 * 8)
+# Fields the next reminder of a task is computed from
+REMINDER_SOURCE_FIELDS = ('task_date', 'start_at', 'all_day', 'notification', 'repeat', 'is_deleted')
+# Columns only the reminder jobs write once a task exists, saves leave them alone unless the reminder is recomputed
+REMINDER_COLUMNS = ('reminder_at', 'reminder_sent_at', 'reminder_fired_at')
+
+
+def normalize_text(value):
+    """Lower a text and collapse its whitespace."""
+    return ' '.join((value or '').split()).lower()
+
+
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def as_datetime(day, time):
+    """Get the timestamp of a time of day, in the timezone the days of tasks are counted in."""
+    value = datetime.combine(day, time)
+    if settings.USE_TZ:
+        value = timezone.make_aware(value, get_timezone(), is_dst=False)
+    return value
+
+
+@lru_cache(maxsize=SCHEDULE_CACHE_SIZE)
+def as_time(value):
+    """Get the time of day of a timestamp, in the timezone the days of tasks are counted in."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value, get_timezone())
+    return value.time()
+
+
+def task_schedule(task_date, select_time):
+    """
+    Get the ``(start_at, end_at, select_time)`` to store for a ``select_time`` text on a day.
+
+    Time ranges are stored as timestamps only and leave no text, text that
+    isn't a time range is kept as is. A range ending before it starts ends
+    the next day.
+    """
+    if isinstance(task_date, datetime):
+        task_date = task_date.date()
+    try:
+        times = parse_time_range(select_time)
+    except (AttributeError, TypeError, ValueError):
+        return None, None, select_time
+    if times is None:
+        return None, None, ''
+    if task_date is None:
+        return None, None, select_time
+
+    start, end = times
+    start_at = as_datetime(task_date, start)
+    end_at = None
+    if end is not None:
+        end_at = as_datetime(task_date if end >= start else task_date + timedelta(days=1), end)
+    return start_at, end_at, ''
+
+
+def task_time_text(start_at, end_at, select_time):
+    """Get the ``select_time`` text of a task, derived from its timestamps when it has some."""
+    if start_at is None:
+        return select_time or ''
+    return format_time_range(as_time(start_at), as_time(end_at) if end_at is not None else None)
+
+
+def task_fingerprint(user_id, title, task_date, select_time):
+    """
+    Fingerprint of an user's task on a day and time, duplicated tasks share it.
+
+    Tasks without an user, title, day or time have no fingerprint and are never
+    duplicates. Migration ``0007_task_fingerprint`` backfilled it from the raw
+    ``select_time`` texts, ``backfill_task_schedule`` refreshes it from the parsed times.
+    """
+    if isinstance(task_date, datetime):
+        task_date = task_date.date()
+    title, select_time = normalize_text(title), normalize_text(select_time)
+    if user_id is None or not title or task_date is None or not select_time:
+        return None
+    value = '%s|%s|%s|%s' % (user_id, title, task_date.isoformat(), select_time)
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def task_reminder_at(task_date, start_at, all_day, notification, repeat, after=None, fired_at=None):
+    """
+    Get the next time the reminder of a task fires after ``after``, now by default.
+
+    Repeating tasks remind of their next occurrence. None when the task has no
+    notification or no reminder left. ``fired_at`` is the due time of the last
+    reminder sent, reminders up to it are never armed again: jobs send them
+    ahead of time.
+    """
+    if isinstance(task_date, datetime):
+        task_date = task_date.date()
+    if not notification or task_date is None:
+        return None
+    after = after or timezone.now()
+    if fired_at is not None and fired_at > after:
+        after = fired_at
+    at = as_time(start_at) if start_at is not None and not all_day else REMINDER_DAY_TIME
+
+    reminder_at = as_datetime(task_date, at) - REMINDER_LEAD
+    if reminder_at > after:
+        return reminder_at
+    if not repeat:
+        return None
+
+    # The recurrence engine imports the models
+    from .recurrence import expand
+    first = (timezone.localtime(after, get_timezone()) if timezone.is_aware(after) else after).date()
+    for span in REMINDER_SEARCH_SPANS:
+        for day in expand(task_date, repeat, first, first + timedelta(days=span)):
+            reminder_at = as_datetime(day, at) - REMINDER_LEAD
+            if reminder_at > after:
+                return reminder_at
+    return None
+
 
 class Task(models.Model):
-    """Define all task's properties here."""
+    """
+    Define all task's properties here.
+
+    On PostgreSQL 13 and later the table is partitioned by month of
+    ``task_date``, see migration ``0012_task_partitions``: ``id`` is no
+    primary key there, only a plain index, and ids are only unique because
+    they all come from its sequence: new tasks get theirs from it, or from
+    ``next_task_ids``, never from anywhere else. Lookups by id alone probe
+    every partition, filter on ``task_date`` too when it is known.
+    """
+
+    # Values of ``repeat``
+    REPEAT_NONE = 0
+    REPEAT_DAILY = 1
+    REPEAT_WEEKLY = 2
+    REPEAT_MONTHLY = 3
+    REPEAT_YEARLY = 4
 
     class Meta:
         """Meta data."""
 
         ordering = ['title']
+        # Serves the delta sync, which walks an user's tasks in (change_txid, id) order
+        index_together = [['user', 'change_txid', 'id']]
 
     user = models.ForeignKey(UserProfile, related_name='task', null=True, blank=True)
 
     title = models.CharField(max_length=255, default='', null=True, blank=True)
     description = models.CharField(max_length=255, default='', null=True, blank=True)
+    # Legacy texts, only kept when they can't be parsed to ``task_date``, ``start_at`` and ``end_at``
     select_date = models.CharField(max_length=255, default='', null=True, blank=True)
     select_time = models.CharField(max_length=255, default='', null=True, blank=True)
-    all_day = models.PositiveIntegerField(default=0, null=True, blank=True)
+    # Times of day on ``task_date`` anchored in ``DEFAULT_TIMEZONE``, the timezone the days of tasks are counted in
+    start_at = models.DateTimeField(null=True, blank=True)
+    end_at = models.DateTimeField(null=True, blank=True)
+    all_day = models.PositiveSmallIntegerField(default=0, null=True, blank=True)
     location = models.CharField(max_length=255, default='', null=True, blank=True)
-    notification = models.PositiveIntegerField(default=0, null=True, blank=True)
-    repeat = models.PositiveIntegerField(default=0, null=True, blank=True)
+    notification = models.PositiveSmallIntegerField(default=0, null=True, blank=True)
+    repeat = models.PositiveSmallIntegerField(default=0, null=True, blank=True)
 
     is_deleted = models.BooleanField(default=False, blank=True)
+    # When the task went to the trash, it is purged for good once older than the retention
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
     task_date = models.DateField(auto_now=False, default=timezone.now, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Id of the last transaction writing the task, set by a trigger, see ``TaskResource.get_changes``
+    change_txid = models.BigIntegerField(null=True, blank=True, editable=False)
+    # Unique among an user's live tasks, see ``task_fingerprint``
+    fingerprint = models.CharField(max_length=32, null=True, blank=True, editable=False)
+    # Next time the task's reminder fires, see ``task_reminder_at``, the last time one was sent, and when that
+    # one was due
+    reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_fired_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # ``search_vector`` is a database only tsvector column, kept up to date by a trigger
+    objects = SearchManagerExt(search_field='search_vector', config='pg_catalog.english')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded day and repeat, cached listings are invalidated when they change.
+
+        The fields of the reminder are remembered too, saves only recompute it when they change.
+        """
+        instance = super(Task, cls).from_db(db, field_names, values)
+        instance._loaded_task_date = instance.__dict__.get('task_date')
+        instance._loaded_repeat = instance.__dict__.get('repeat')
+        instance._loaded_reminder_source = instance.reminder_source()
+        return instance
+
+    def reminder_source(self):
+        """Values of the ``REMINDER_SOURCE_FIELDS`` loaded on the task."""
+        return tuple(self.__dict__.get(name) for name in REMINDER_SOURCE_FIELDS)
+
+    @property
+    def time_text(self):
+        """The ``select_time`` text of the task."""
+        return task_time_text(self.start_at, self.end_at, self.select_time)
+
+    def set_schedule(self, task_date, select_time):
+        """Put the task on a day, at the time of a ``select_time`` text."""
+        self.task_date = task_date
+        self.start_at, self.end_at, self.select_time = task_schedule(task_date, select_time)
+        if task_date is not None:
+            self.select_date = ''
+
+    def save(self, *args, **kwargs):
+        """
+        Keep the fingerprint, the next reminder and the deletion time in step with the fields they are made of.
+
+        The reminder is only recomputed when its fields changed since the task
+        was loaded, never before the one last sent. Otherwise the reminder
+        columns aren't written: the reminder jobs may have claimed the
+        reminder since the task was loaded.
+        """
+        self.fingerprint = task_fingerprint(self.user_id, self.title, self.task_date, self.time_text)
+        reminder_source = self.reminder_source()
+        rearm = self._state.adding or reminder_source != getattr(self, '_loaded_reminder_source', None)
+        if rearm:
+            self.reminder_at = task_reminder_at(self.task_date, self.start_at, self.all_day, self.notification,
+                                                self.repeat, fired_at=self.reminder_fired_at)
+        if not self.is_deleted:
+            self.deleted_at = None
+        elif self.deleted_at is None:
+            self.deleted_at = timezone.now()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'fingerprint', 'deleted_at'} | \
+                ({'reminder_at'} if rearm else set())
+        elif not rearm and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in REMINDER_COLUMNS and
+                                       field.attname not in deferred]
+        super(Task, self).save(*args, **kwargs)
+        self._loaded_reminder_source = reminder_source
 
     def __str__(self):
         """Django required func."""
         return self.title
+
+
+class TaskImport(models.Model):
+    """A file of tasks imported in the background."""
+
+    # Values of ``status``
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    user = models.ForeignKey(UserProfile, related_name='task_imports')
+    file = models.FileField(upload_to='task_imports/%Y/%m/%d', null=True, blank=True)
+    file_format = models.CharField(max_length=8)
+    status = models.CharField(max_length=16, default=PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    errors_count = models.PositiveIntegerField(default=0)
+    # JSON list of the first errors, see ``backend.task.importer``
+    errors = models.TextField(default='[]')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """Django required func."""
+        return '%s import %s' % (self.file_format, self.id)
@@ -0,0 +1,134 @@
+"""Monthly partitions of the task table."""
+from __future__ import absolute_import
+import re
+from datetime import date
+from django.conf import settings
+from django.db import connection, transaction
+from .models import Task
+
+# Months after the current one that get their partition ahead of time
+PARTITION_MONTHS_AHEAD = getattr(settings, 'TASK_PARTITION_MONTHS_AHEAD', 3)
+# Partitions of months older than this many months are detached, never when 0
+PARTITION_ARCHIVE_MONTHS = getattr(settings, 'TASK_PARTITION_ARCHIVE_MONTHS', 0)
+PARTITION_NAME = re.compile(r'^%s_p(\d{4})(\d{2})$' % Task._meta.db_table)
+
+
+def add_months(month, months):
+    """Get the first day of the month ``months`` after the month of ``month``."""
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Name of the partition of a month."""
+    return '%s_p%04d%02d' % (Task._meta.db_table, month.year, month.month)
+
+
+def is_partitioned():
+    """Whether the task table is partitioned, see migration ``0012_task_partitions``."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [Task._meta.db_table])
+        return cursor.fetchone()[0] == 'p'
+
+
+def partitioned_months():
+    """Get the first days of the months holding a partition."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT relname FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+        """, [Task._meta.db_table])
+        names = [row[0] for row in cursor.fetchall()]
+    return set(date(int(match.group(1)), int(match.group(2)), 1)
+               for match in (PARTITION_NAME.match(name) for name in names) if match)
+
+
+def default_months():
+    """Get the first days of the months holding rows of the default partition."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT date_trunc('month', task_date)::date FROM %s_default WHERE task_date IS NOT NULL
+        """ % Task._meta.db_table)
+        return set(row[0] for row in cursor.fetchall())
+
+
+def create_partition(month):
+    """
+    Create the partition of a month, moving its rows out of the default partition.
+
+    Postgres refuses to create a partition over rows of the default one, so
+    the partition is filled as a plain table then attached, all in one
+    transaction. Check constraints tell the attach that neither table holds
+    rows of the wrong range, it would scan both under an exclusive lock
+    otherwise: they are checked before under locks that let tasks be read
+    and written, and dropped once the partition is attached.
+    """
+    table = Task._meta.db_table
+    name = partition_name(month)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)' % (name, table))
+        cursor.execute("""
+            WITH moved AS (
+                DELETE FROM %s_default WHERE task_date >= %%s AND task_date < %%s RETURNING *
+            )
+            INSERT INTO %s SELECT * FROM moved
+        """ % (table, name), bounds)
+        moved = cursor.rowcount
+        cursor.execute("""
+            ALTER TABLE %s ADD CONSTRAINT %s_bounds
+            CHECK (task_date IS NOT NULL AND task_date >= %%s AND task_date < %%s)
+        """ % (name, name), bounds)
+        cursor.execute("""
+            ALTER TABLE %s_default ADD CONSTRAINT %s_default_excludes
+            CHECK (task_date IS NULL OR task_date < %%s OR task_date >= %%s) NOT VALID
+        """ % (table, name), bounds)
+        cursor.execute('ALTER TABLE %s_default VALIDATE CONSTRAINT %s_default_excludes' % (table, name))
+        # Attaching builds the partition's indexes and clones the triggers
+        cursor.execute('ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (%%s) TO (%%s)' % (table, name), bounds)
+        cursor.execute('ALTER TABLE %s DROP CONSTRAINT %s_bounds' % (name, name))
+        cursor.execute('ALTER TABLE %s_default DROP CONSTRAINT %s_default_excludes' % (table, name))
+    return moved
+
+
+def archive_partition(month):
+    """Detach the partition of a month, it is kept as the ``<table>_archive_p<yyyymm>`` table."""
+    table = Task._meta.db_table
+    name = partition_name(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (table, name))
+        cursor.execute('ALTER TABLE %s RENAME TO %s' % (name, name.replace('_p', '_archive_p', 1)))
+
+
+def manage_partitions(today, months_ahead=PARTITION_MONTHS_AHEAD, archive_months=PARTITION_ARCHIVE_MONTHS,
+                      log=None):
+    """
+    Create the partitions of the coming months and of the months left in the default partition, archive old ones.
+
+    :return: the ``(created, archived)`` months.
+    """
+    current = today.replace(day=1)
+    cutoff = add_months(current, -archive_months) if archive_months else None
+    existing = partitioned_months()
+
+    wanted = set(add_months(current, months) for months in range(months_ahead + 1)) | default_months()
+    created = []
+    for month in sorted(wanted - existing):
+        # Rows of archived months stay in the default partition
+        if cutoff is not None and month < cutoff:
+            continue
+        moved = create_partition(month)
+        created.append(month)
+        if log:
+            log('Created %s, %s tasks moved in' % (partition_name(month), moved))
+
+    archived = []
+    for month in sorted(existing):
+        if cutoff is not None and month < cutoff:
+            archive_partition(month)
+            archived.append(month)
+            if log:
+                log('Archived %s' % partition_name(month))
+    return created, archived
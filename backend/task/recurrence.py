@@ -0,0 +1,93 @@
+"""Task recurrence engine."""
+from __future__ import absolute_import
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+from .models import Task
+
+# Expanded (series, range) pairs kept in memory
+EXPAND_CACHE_SIZE = 8192
+
+
+def add_months(day, months):
+    """Get the same day of month ``months`` later, None when that month is too short."""
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    if day.day > calendar.monthrange(year, month)[1]:
+        return None
+    return date(year, month, day.day)
+
+
+@lru_cache(maxsize=EXPAND_CACHE_SIZE)
+def expand(anchor, repeat, start, end):
+    """
+    Get the days a series occurs on within ``[start, end]``, its anchor day excluded.
+
+    Like iCalendar RRULEs, a monthly series on the 31st skips shorter months
+    and a yearly series on February 29th only occurs on leap years.
+
+    :param anchor: ``task_date`` of the series.
+    :param repeat: one of the ``Task.REPEAT_*`` values.
+    """
+    first = max(start, anchor + timedelta(days=1))
+    if first > end:
+        return ()
+
+    if repeat == Task.REPEAT_DAILY:
+        return tuple(first + timedelta(days=n) for n in range((end - first).days + 1))
+
+    if repeat == Task.REPEAT_WEEKLY:
+        first += timedelta(days=-(first - anchor).days % 7)
+        return tuple(first + timedelta(days=n) for n in range(0, (end - first).days + 1, 7))
+
+    if repeat in (Task.REPEAT_MONTHLY, Task.REPEAT_YEARLY):
+        step = 1 if repeat == Task.REPEAT_MONTHLY else 12
+        months = (first.year - anchor.year) * 12 + first.month - anchor.month
+        months += -months % step
+        days = []
+        while True:
+            day = add_months(anchor, months)
+            months += step
+            if day is None:
+                continue
+            if day > end:
+                break
+            if day >= first:
+                days.append(day)
+        return tuple(days)
+
+    return ()
+
+
+def iter_occurrences(profile_id, start, end, fields=('id',)):
+    """
+    Yield ``(day, values)`` for every day in ``[start, end]`` an user's repeating tasks occur on, besides their own
+    ``task_date``.
+
+    Candidate series come from a single query, then every series is expanded
+    over the whole range at once.
+
+    :param fields: task fields to yield the values of.
+    """
+    series = Task.objects \
+        .filter(user_id=profile_id, is_deleted=False, repeat__gt=Task.REPEAT_NONE, task_date__lt=end) \
+        .order_by() \
+        .values_list('task_date', 'repeat', *fields)
+
+    for task in series:
+        for day in expand(task[0], task[1], start, end):
+            yield day, task[2:]
+
+
+def series_occurrences(profile_id, start, end):
+    """
+    Get the days in ``[start, end]`` an user's repeating tasks occur on, besides their own ``task_date``.
+
+    :return: dict of day to the list of ``(task id, task_date)`` of the tasks occurring on it, the task
+        dates let queries by id skip the partitions of other months.
+    """
+    occurrences = {}
+    for day, series in iter_occurrences(profile_id, start, end, ('id', 'task_date')):
+        occurrences.setdefault(day, []).append(series)
+    return occurrences
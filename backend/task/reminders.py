@@ -0,0 +1,115 @@
+"""Task reminders."""
+from __future__ import absolute_import
+import logging
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Task, task_reminder_at
+
+logger = logging.getLogger(__name__)
+
+# Reminders claimed and sent per transaction
+REMINDER_BATCH_SIZE = getattr(settings, 'TASK_REMINDER_BATCH_SIZE', 1000)
+# Jobs sharing the reminders of a minute
+REMINDER_WORKERS = getattr(settings, 'TASK_REMINDER_WORKERS', 4)
+# Dotted path of the class sending reminders
+REMINDER_SENDER = getattr(settings, 'TASK_REMINDER_SENDER', 'backend.task.reminders.LoggingSender')
+REMINDER_FIELDS = ('id', 'user_id', 'title', 'reminder_at', 'task_date', 'start_at', 'all_day', 'notification',
+                   'repeat')
+
+# Takes the earliest due reminders no other worker holds, and marks them sent in the same statement, with the time
+# they were due: saves never arm them again
+CLAIM_SQL = '''
+UPDATE task_task AS task
+SET reminder_at = NULL, reminder_sent_at = %%s, reminder_fired_at = due.reminder_at
+FROM (
+    SELECT id, reminder_at FROM task_task
+    WHERE reminder_at IS NOT NULL AND is_deleted = false AND reminder_at < %%s
+    ORDER BY reminder_at
+    LIMIT %%s
+    FOR UPDATE SKIP LOCKED
+) AS due
+WHERE task.id = due.id
+RETURNING %s
+''' % ', '.join('due.reminder_at' if name == 'reminder_at' else 'task.%s' % name for name in REMINDER_FIELDS)
+
+
+class LoggingSender(object):
+    """Log reminders, until a push or email sender is configured."""
+
+    def send(self, reminders):
+        """Send a batch of reminders."""
+        for reminder in reminders:
+            logger.info('Reminder of task %s to user %s: %s', reminder['id'], reminder['user_id'], reminder['title'])
+
+
+class LocmemSender(object):
+    """Keep reminders in ``outbox``, for tests."""
+
+    outbox = []
+
+    def send(self, reminders):
+        """Send a batch of reminders."""
+        LocmemSender.outbox.extend(reminders)
+
+
+def get_sender():
+    """Get an instance of the configured sender."""
+    return import_string(REMINDER_SENDER)()
+
+
+def claim_reminders(until, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Claim up to ``batch_size`` reminders due before ``until``, as dicts of ``REMINDER_FIELDS``.
+
+    Claimed reminders are marked sent as they are claimed, a reminder is
+    never sent twice but is lost if sending it fails. Repeating tasks move on
+    to their next reminder. On PostgreSQL concurrent workers skip the rows
+    another one holds, elsewhere only a single worker should run.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(CLAIM_SQL, [now, until, batch_size])
+                reminders = [dict(zip(REMINDER_FIELDS, row)) for row in cursor.fetchall()]
+        else:
+            reminders = list(Task.objects
+                             .filter(reminder_at__isnull=False, is_deleted=False, reminder_at__lt=until)
+                             .order_by('reminder_at')
+                             .values(*REMINDER_FIELDS)[:batch_size])
+            Task.objects.filter(id__in=[reminder['id'] for reminder in reminders]) \
+                .update(reminder_at=None, reminder_sent_at=now, reminder_fired_at=F('reminder_at'))
+
+        # Missed occurrences are skipped, the next reminder is the first one after now and the claimed one
+        next_reminders = {}
+        for reminder in reminders:
+            if reminder['repeat']:
+                next_at = task_reminder_at(reminder['task_date'], reminder['start_at'], reminder['all_day'],
+                                           reminder['notification'], reminder['repeat'], now,
+                                           fired_at=reminder['reminder_at'])
+                if next_at is not None:
+                    next_reminders[reminder['id']] = next_at
+        if next_reminders:
+            Task.objects.filter(id__in=list(next_reminders)).update(reminder_at=Case(
+                *[When(pk=task_id, then=Value(next_at)) for task_id, next_at in next_reminders.items()],
+                output_field=Task._meta.get_field('reminder_at')))
+    return reminders
+
+
+def send_due_reminders(until, batch_size=REMINDER_BATCH_SIZE):
+    """Claim and send the reminders due before ``until`` batch by batch, return how many were sent."""
+    sender = get_sender()
+    sent = 0
+    while True:
+        reminders = claim_reminders(until, batch_size)
+        if reminders:
+            try:
+                sender.send(reminders)
+                sent += len(reminders)
+            except Exception:
+                logger.exception('Failed sending %s reminders', len(reminders))
+        if len(reminders) < batch_size:
+            return sent
@@ -0,0 +1,40 @@
+"""All task handlers."""
+
+from django.dispatch import receiver
+from django.db import models, transaction
+from .cache import as_day, invalidate_day, invalidate_series
+from .models import Task
+from .suggest import suggester
+
+
+@receiver(models.signals.post_save, sender=Task)
+def invalidate_task_listing_on_save(sender, **kwargs):
+    """Invalidate cached listings of the days a task was and is on, once the change is committed."""
+    task = kwargs["instance"]
+    profile_id = task.user_id
+    task_dates = {as_day(task.task_date)}
+    loaded_task_date = getattr(task, '_loaded_task_date', None)
+    if loaded_task_date is not None:
+        task_dates.add(as_day(loaded_task_date))
+    series = bool(task.repeat or getattr(task, '_loaded_repeat', None))
+    task._loaded_task_date = task.task_date
+    task._loaded_repeat = task.repeat
+    # Bumped before the commit, a concurrent reader could cache the old rows under the new versions
+    transaction.on_commit(lambda: invalidate_tasks(profile_id, task_dates, series))
+
+
+@receiver(models.signals.post_delete, sender=Task)
+def invalidate_task_listing_on_delete(sender, **kwargs):
+    """Invalidate cached listings of the day a task was on, once the change is committed."""
+    task = kwargs["instance"]
+    profile_id, task_dates, series = task.user_id, {as_day(task.task_date)}, bool(task.repeat)
+    transaction.on_commit(lambda: invalidate_tasks(profile_id, task_dates, series))
+
+
+def invalidate_tasks(profile_id, task_dates, series=False):
+    """Invalidate cached listings of an user's days, of its repeating tasks if ``series``, and its suggestions."""
+    for task_date in task_dates:
+        invalidate_day(profile_id, task_date)
+    if series:
+        invalidate_series(profile_id)
+    suggester.forget(profile_id)
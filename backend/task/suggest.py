@@ -0,0 +1,74 @@
+"""Task title suggestions."""
+from __future__ import absolute_import
+from ..commons.lru import LRUCache
+from .models import Task
+
+# Hard cap of suggestions per prefix
+SUGGEST_LIMIT = 10
+# Users whose recent prefixes are kept by this process, and prefixes kept per user
+SUGGEST_USERS = 2048
+SUGGEST_PREFIXES_PER_USER = 32
+# Seconds a suggestion list is reused, writes handled by other processes show up after it
+SUGGEST_TTL = 30
+
+
+def like_prefix(prefix):
+    """Escape LIKE wildcards of a prefix and append the trailing one."""
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class TitleSuggester(object):
+    """Suggest an user's task titles starting with a prefix."""
+
+    def __init__(self, limit=SUGGEST_LIMIT):
+        """Initialize."""
+        self.limit = limit
+        self.users = LRUCache(maxsize=SUGGEST_USERS, ttl=SUGGEST_TTL)
+
+    def suggest(self, profile_id, prefix):
+        """Get up to ``limit`` distinct titles, in title order."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        prefixes = self.users.get(profile_id)
+        if prefixes is None:
+            prefixes = LRUCache(maxsize=SUGGEST_PREFIXES_PER_USER, ttl=SUGGEST_TTL)
+            self.users.set(profile_id, prefixes)
+
+        titles = prefixes.get(prefix)
+        if titles is None:
+            titles = self.narrow(prefixes, prefix)
+        if titles is None:
+            titles = self.query(profile_id, prefix)
+        prefixes.set(prefix, titles)
+        return titles
+
+    def narrow(self, prefixes, prefix):
+        """
+        Reuse the titles of a shorter prefix.
+
+        Only a list under the cap holds every match of its prefix, so only such
+        lists can be filtered in memory while the user keeps typing.
+        """
+        for end in range(len(prefix) - 1, 0, -1):
+            titles = prefixes.get(prefix[:end])
+            if titles is not None and len(titles) < self.limit:
+                return [title for title in titles if title.lower().startswith(prefix)]
+        return None
+
+    def query(self, profile_id, prefix):
+        """Match titles through the (user_id, lower(title)) trigram index."""
+        return list(Task.objects
+                    .filter(user_id=profile_id, is_deleted=False)
+                    .extra(where=['lower("task_task"."title") LIKE %s'], params=[like_prefix(prefix)])
+                    .order_by('title')
+                    .values_list('title', flat=True)
+                    .distinct()[:self.limit])
+
+    def forget(self, profile_id):
+        """Drop the suggestions this process keeps for an user."""
+        self.users.delete(profile_id)
+
+
+suggester = TitleSuggester()
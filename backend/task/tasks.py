@@ -0,0 +1,70 @@
+"""Task background jobs."""
+from __future__ import absolute_import
+import logging
+from datetime import timedelta
+from celery import group
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..commons.datetime_utils import get_current_date
+from ..taskapp.celery import app
+from .importer import TaskImporter
+from .models import TaskImport
+from .partitions import is_partitioned, manage_partitions
+from .trash import TRASH_RETENTION, purge_trash
+from .reminders import REMINDER_WORKERS, send_due_reminders
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_result=True)
+def import_tasks(import_id):
+    """Import the tasks of an uploaded file."""
+    # Claim the import, a redelivered message must not run it twice
+    if not TaskImport.objects.filter(id=import_id, status=TaskImport.PENDING).update(status=TaskImport.RUNNING):
+        return
+    task_import = TaskImport.objects.get(id=import_id)
+
+    importer = TaskImporter(task_import)
+    try:
+        task_import.file.open('rb')
+        try:
+            importer.run(task_import.file)
+        finally:
+            task_import.file.close()
+        status = TaskImport.DONE
+    except Exception as e:
+        logger.exception('Task import %s failed', import_id)
+        importer.add_error(None, 'Import stopped: %s' % e)
+        importer.save_progress()
+        status = TaskImport.FAILED
+
+    task_import.file.delete(save=False)
+    TaskImport.objects.filter(id=import_id).update(status=status, finished_at=timezone.now(), file='')
+
+
+@app.task(ignore_result=True)
+def dispatch_reminders():
+    """Fan the reminders due by the end of the current minute out to ``REMINDER_WORKERS`` jobs, run every minute."""
+    until = timezone.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    group(send_reminders.s(until.isoformat()) for _ in range(REMINDER_WORKERS)).delay()
+
+
+@app.task(ignore_result=True)
+def send_reminders(until):
+    """Send reminders due before ``until`` until none is left, alongside the other jobs of the minute."""
+    sent = send_due_reminders(parse_datetime(until))
+    logger.info('Sent %s reminders due before %s', sent, until)
+
+
+@app.task(ignore_result=True)
+def manage_task_partitions():
+    """Create the coming months' partitions and archive old ones, run daily."""
+    if is_partitioned():
+        manage_partitions(get_current_date(), log=logger.info)
+
+
+@app.task(ignore_result=True)
+def purge_task_trash():
+    """Delete for good the tasks in the trash for longer than the retention, run hourly."""
+    purged = purge_trash(timezone.now() - TRASH_RETENTION)
+    logger.info('Purged %s deleted tasks', purged)
@@ -0,0 +1,47 @@
+"""Task listing cache tests."""
+from __future__ import absolute_import
+from datetime import date
+from unittest import mock
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from test_plus.test import TestCase
+from ..cache import cached_listing, invalidate_day
+
+
+class ListingCacheTestCase(TestCase):
+    """Cached pages of /tasks/listing/."""
+
+    def setUp(self):
+        """A listing request, the same day and params whatever its ``Accept``."""
+        cache.clear()
+        self.request = RequestFactory().get('/api/v1/tasks/listing/', {'date': 'June 23, 2016'})
+        self.task_date = date(2016, 6, 23)
+        self.rendered = []
+
+    def get_listing(self, response_format):
+        """Get the cached listing in a format, recording the renders."""
+        def render():
+            self.rendered.append(response_format)
+            return HttpResponse('%s page' % response_format, content_type=response_format)
+        return cached_listing(self.request, 1, self.task_date, response_format, render)
+
+    def test_pages_are_cached_per_format(self):
+        """A page cached for a format is never served for another one."""
+        self.assertEqual(self.get_listing('application/json')['Content-Type'], 'application/json')
+        response = self.get_listing('application/xml')
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertEqual(response.content, b'application/xml page')
+        self.assertEqual(self.get_listing('application/json').content, b'application/json page')
+        self.assertEqual(self.rendered, ['application/json', 'application/xml'])
+
+    def test_stale_pages_are_kept_per_format(self):
+        """While a page re-renders, the stale page served is the one of the same format."""
+        self.get_listing('application/json')
+        invalidate_day(1, self.task_date)
+        # Another request holds the right to re-render every page
+        add = cache.add
+        with mock.patch.object(cache, 'add', lambda key, *args: not key.endswith(':lock') and add(key, *args)):
+            self.assertEqual(self.get_listing('application/json')['Content-Type'], 'application/json')
+            self.assertEqual(self.get_listing('application/xml')['Content-Type'], 'application/xml')
+        self.assertEqual(self.rendered, ['application/json', 'application/xml'])
@@ -0,0 +1,55 @@
+"""Task import tests."""
+from __future__ import absolute_import
+import csv
+from datetime import date
+from unittest import skipUnless
+from django.db import connection
+from django.utils import timezone
+from test_plus.test import TestCase
+from ...account.models import UserProfile
+from ..importer import COPY_SQL, IMPORT_COLUMNS, IMPORT_NULL_COLUMNS, TaskImporter, copy_buffer, insert_tasks
+from ..models import Task, TaskImport
+
+
+class InsertTasksTestCase(TestCase):
+    """Rows of imported tasks, and the ``COPY`` loading them on PostgreSQL."""
+
+    def setUp(self):
+        """A task without a time, a fingerprint or a reminder, and a task with a time."""
+        self.profile = UserProfile.objects.create(user=self.make_user())
+        importer = TaskImporter(TaskImport(user=self.profile, file_format='csv'))
+        fields = {'title': 'Call Bob', 'description': '', 'location': '', 'task_date': date(2016, 6, 23),
+                  'select_time': '', 'all_day': 0, 'notification': 0, 'repeat': Task.REPEAT_NONE}
+        self.tasks = [importer.build_task(fields),
+                      importer.build_task(dict(fields, select_time='10:00 AM', notification=1))]
+        for task in self.tasks:
+            task['updated_at'] = timezone.now()
+
+    def test_copy_buffer_nulls(self):
+        """None is only written to the columns ``COPY`` reads empty strings of as NULL."""
+        self.assertIn('FORCE_NULL (%s)' % ', '.join(IMPORT_NULL_COLUMNS), COPY_SQL)
+        rows = list(csv.reader(copy_buffer(self.tasks)))
+        self.assertEqual(len(rows), 2)
+        for task, row in zip(self.tasks, rows):
+            for column, text in zip(IMPORT_COLUMNS, row):
+                if task[column] is None:
+                    self.assertIn(column, IMPORT_NULL_COLUMNS)
+                    self.assertEqual(text, '')
+                elif task[column] == '':
+                    self.assertNotIn(column, IMPORT_NULL_COLUMNS)
+        self.assertTrue(all(self.tasks[0][column] is None for column in IMPORT_NULL_COLUMNS))
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_copy_nulls(self):
+        """``COPY`` loads None as NULL, and empty texts as empty texts."""
+        insert_tasks(self.tasks)
+        task = Task.objects.get(user=self.profile, start_at__isnull=True)
+        self.assertEqual((task.end_at, task.fingerprint, task.reminder_at), (None, None, None))
+        self.assertEqual((task.description, task.location, task.select_time), ('', '', ''))
+        task = Task.objects.get(user=self.profile, start_at__isnull=False)
+        self.assertIsNotNone(task.fingerprint)
+
+    def test_insert_tasks(self):
+        """Rows are inserted with their values."""
+        insert_tasks(self.tasks)
+        self.assertEqual(Task.objects.filter(user=self.profile).count(), 2)
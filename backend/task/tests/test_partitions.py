@@ -0,0 +1,64 @@
+"""Task partition tests."""
+from __future__ import absolute_import
+from datetime import date
+from django.db import connection
+from test_plus.test import TestCase
+from ...account.models import UserProfile
+from ..models import Task
+from ..partitions import archive_partition, create_partition, is_partitioned, manage_partitions, partition_name, \
+    partitioned_months
+
+
+class PartitionTestCase(TestCase):
+    """Monthly partitions of the task table, see migration ``0012_task_partitions``."""
+
+    def setUp(self):
+        """An user."""
+        if not is_partitioned():
+            self.skipTest('The task table is only partitioned on PostgreSQL 13 and later')
+        self.profile = UserProfile.objects.create(user=self.make_user())
+
+    def create_task(self, task_date):
+        """Create a task, its foreign key checked at once: tables with pending checks can't be altered."""
+        task = Task.objects.create(user=self.profile, title='Call Bob', task_date=task_date)
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        return task
+
+    def table_of(self, task):
+        """Name of the table holding a task."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM task_task WHERE id = %s', [task.id])
+            return cursor.fetchone()[0]
+
+    def test_create_partition_moves_default_rows(self):
+        """Tasks of a month without a partition wait in the default one, its partition takes them."""
+        month = date(2041, 3, 1)
+        task = self.create_task(date(2041, 3, 9))
+        self.assertEqual(self.table_of(task), 'task_task_default')
+        self.assertEqual(create_partition(month), 1)
+        self.assertEqual(self.table_of(task), partition_name(month))
+        self.assertIn(month, partitioned_months())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_constraint WHERE conname LIKE %s", [partition_name(month) + '%'])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_tasks_move_between_partitions(self):
+        """A task moved to another month moves to its partition, and is still found by id."""
+        create_partition(date(2041, 5, 1))
+        create_partition(date(2041, 6, 1))
+        task = self.create_task(date(2041, 5, 9))
+        self.assertEqual(self.table_of(task), 'task_task_p204105')
+        task.task_date = date(2041, 6, 2)
+        task.save()
+        self.assertEqual(self.table_of(task), 'task_task_p204106')
+        self.assertEqual(Task.objects.get(id=task.id).task_date, date(2041, 6, 2))
+
+    def test_manage_partitions(self):
+        """The coming months get their partition, old ones are archived."""
+        created, _ = manage_partitions(date(2042, 1, 15), months_ahead=1)
+        self.assertEqual(created, [date(2042, 1, 1), date(2042, 2, 1)])
+        self.create_task(date(2042, 1, 9))
+        archive_partition(date(2042, 1, 1))
+        self.assertNotIn(date(2042, 1, 1), partitioned_months())
+        self.assertFalse(Task.objects.filter(user=self.profile).exists())
@@ -0,0 +1,99 @@
+"""Task reminder tests."""
+from __future__ import absolute_import
+from datetime import timedelta
+from django.utils import timezone
+from test_plus.test import TestCase
+from ...account.models import UserProfile
+from ...commons.datetime_utils import get_timezone
+from ..models import REMINDER_LEAD, Task
+from ..reminders import LocmemSender, claim_reminders, send_due_reminders
+
+
+class ReminderTestCase(TestCase):
+    """
+    Claiming reminders, and saves never arming a claimed one again.
+
+    On PostgreSQL, as the test settings run, claims go through ``CLAIM_SQL``.
+    """
+
+    def setUp(self):
+        """A task starting in a couple of minutes, and the end of the window the jobs claim."""
+        self.profile = UserProfile.objects.create(user=self.make_user())
+        self.starts_at = self.local_minute(timezone.now() + REMINDER_LEAD + timedelta(minutes=2))
+        self.reminder_at = self.starts_at - REMINDER_LEAD
+        self.until = self.reminder_at + timedelta(minutes=2)
+        self.task = self.create_task(self.starts_at)
+        LocmemSender.outbox = []
+
+    def local_minute(self, value):
+        """A time, in the timezone the days of tasks are counted in, floored to the minute."""
+        return timezone.localtime(value, get_timezone()).replace(second=0, microsecond=0)
+
+    def create_task(self, starts_at, repeat=Task.REPEAT_NONE):
+        """Create a task with a notification, starting at ``starts_at``."""
+        task = Task(user=self.profile, title='Call Bob', notification=1, repeat=repeat)
+        task.set_schedule(starts_at.date(), starts_at.strftime('%I:%M %p'))
+        task.save()
+        return task
+
+    def reload(self):
+        """Read the task again."""
+        return Task.objects.get(id=self.task.id)
+
+    def test_claim_marks_the_reminder_fired(self):
+        """A claimed reminder is taken off the task, with the time it was due."""
+        self.assertEqual(self.task.reminder_at, self.reminder_at)
+        reminders = claim_reminders(self.until)
+        self.assertEqual([reminder['id'] for reminder in reminders], [self.task.id])
+        task = self.reload()
+        self.assertIsNone(task.reminder_at)
+        self.assertEqual(task.reminder_fired_at, self.reminder_at)
+        self.assertIsNotNone(task.reminder_sent_at)
+        self.assertEqual(claim_reminders(self.until), [])
+
+    def test_claims_the_earliest_reminders_first(self):
+        """Reminders are claimed in the order they are due, a batch at a time."""
+        later = self.create_task(self.starts_at + timedelta(minutes=1))
+        self.assertEqual([reminder['id'] for reminder in claim_reminders(self.until, batch_size=1)], [self.task.id])
+        self.assertEqual([reminder['id'] for reminder in claim_reminders(self.until, batch_size=1)], [later.id])
+        self.assertEqual(claim_reminders(self.until, batch_size=1), [])
+
+    def test_saves_dont_rearm_a_sent_reminder(self):
+        """Editing a task whose reminder was sent ahead of its start doesn't send it again."""
+        self.assertEqual(send_due_reminders(self.until), 1)
+        task = self.reload()
+        task.title = 'Call Bob back'
+        task.save()
+        self.assertIsNone(self.reload().reminder_at)
+        self.assertEqual(send_due_reminders(self.until), 0)
+        self.assertEqual(len(LocmemSender.outbox), 1)
+
+    def test_stale_save_keeps_the_claim(self):
+        """A task loaded before its reminder was claimed doesn't write the reminder back."""
+        task = self.reload()
+        claim_reminders(self.until)
+        task.title = 'Call Bob back'
+        task.save()
+        task = self.reload()
+        self.assertEqual(task.title, 'Call Bob back')
+        self.assertIsNone(task.reminder_at)
+
+    def test_rescheduling_rearms_the_reminder(self):
+        """Moving a task after its reminder was sent arms the reminder of the new time."""
+        claim_reminders(self.until)
+        task = self.reload()
+        later = self.starts_at + timedelta(hours=2)
+        task.set_schedule(later.date(), later.strftime('%I:%M %p'))
+        task.save()
+        self.assertEqual(self.reload().reminder_at, later - REMINDER_LEAD)
+
+    def test_repeating_task_moves_to_its_next_occurrence(self):
+        """A repeating task reminds of its next occurrence once a reminder is claimed, saves keep it."""
+        self.task.delete()
+        self.task = self.create_task(self.starts_at, repeat=Task.REPEAT_DAILY)
+        claim_reminders(self.until)
+        task = self.reload()
+        self.assertEqual(task.reminder_at, self.reminder_at + timedelta(days=1))
+        task.title = 'Call Bob daily'
+        task.save()
+        self.assertEqual(self.reload().reminder_at, self.reminder_at + timedelta(days=1))
@@ -0,0 +1,47 @@
+"""Task trash."""
+from __future__ import absolute_import
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Task
+
+# How long deleted tasks stay in the trash before they are purged
+TRASH_RETENTION = timedelta(days=getattr(settings, 'TASK_TRASH_RETENTION_DAYS', 30))
+# Tasks purged per transaction, and seconds to wait between transactions so replicas keep up
+PURGE_BATCH_SIZE = getattr(settings, 'TASK_TRASH_PURGE_BATCH_SIZE', 500)
+PURGE_PAUSE = getattr(settings, 'TASK_TRASH_PURGE_PAUSE', 0.1)
+
+
+def purge_trash(before, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE):
+    """
+    Delete for good the tasks deleted before ``before``, return how many were purged.
+
+    Rows are walked in ``(deleted_at, id)`` keyset batches over the purge
+    index, each deleted in a short transaction of its own. The DELETE
+    checks the rows are still in the trash, a task restored meanwhile is kept.
+    """
+    trash = Task.objects \
+        .filter(is_deleted=True, deleted_at__lt=before) \
+        .order_by('deleted_at', 'id') \
+        .values_list('deleted_at', 'id')
+
+    purged = 0
+    position = None
+    while True:
+        batch = trash
+        if position is not None:
+            batch = batch.filter(Q(deleted_at__gt=position[0]) | Q(deleted_at=position[0], id__gt=position[1]))
+        rows = list(batch[:batch_size])
+        if rows:
+            ids = [task_id for _, task_id in rows]
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Skips the model signals, purged tasks were out of every cached listing already
+                cursor.execute('DELETE FROM %s WHERE id IN (%s) AND is_deleted = %%s AND deleted_at < %%s' % (
+                    Task._meta.db_table, ', '.join(['%s'] * len(ids))), ids + [True, before])
+                purged += cursor.rowcount
+        if len(rows) < batch_size:
+            return purged
+        position = rows[-1]
+        time.sleep(pause)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/dev/ref/settings/
 from __future__ import absolute_import, unicode_literals
 
 import environ
+from celery.schedules import crontab
 from os.path import abspath, basename, dirname
 from sys import path
 
@@ -119,6 +120,9 @@ DATABASES['default']['ATOMIC_REQUESTS'] = True
 # In a Windows environment this must be set to your system time zone.
 TIME_ZONE = 'UTC'
 
+# Time zone the days of tasks are counted in, "today" of the task listing is today there
+DEFAULT_TIMEZONE = env('DEFAULT_TIMEZONE', default='America/New_York')
+
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#language-code
 LANGUAGE_CODE = 'en-us'
 
@@ -222,9 +226,107 @@ INSTALLED_APPS += ('backend.taskapp.celery.CeleryConfig',)
 # if you are not using the django database broker (e.g. rabbitmq, redis, memcached), you can remove the next line.
 INSTALLED_APPS += ('kombu.transport.django',)
 BROKER_URL = env("CELERY_BROKER_URL", default='django://')
+CELERYBEAT_SCHEDULE = {
+    'dispatch-task-reminders': {
+        'task': 'backend.task.tasks.dispatch_reminders',
+        'schedule': crontab(minute='*'),
+    },
+    'manage-task-partitions': {
+        'task': 'backend.task.tasks.manage_task_partitions',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'purge-task-trash': {
+        'task': 'backend.task.tasks.purge_task_trash',
+        'schedule': crontab(minute=15),
+    },
+}
 # END CELERY
 
 # Location of root django.contrib.admin URL, use {% url 'admin:index' %}
 ADMIN_URL = r'^admin/'
 
 # Your common stuff: Below this line define 3rd party library settings
+
+# API KEY AND ACCESS TOKEN AUTHENTICATION
+# ------------------------------------------------------------------------------
+# Seconds the credentials of an API key stay in the shared cache, key and user changes invalidate them earlier
+API_KEY_CACHE_TIMEOUT = env.int('API_KEY_CACHE_TIMEOUT', default=300)
+# Seconds unknown API keys stay in the shared cache, any key or user change invalidates them earlier
+API_KEY_UNKNOWN_CACHE_TIMEOUT = env.int('API_KEY_UNKNOWN_CACHE_TIMEOUT', default=60)
+# Credentials each process keeps, and seconds it reuses them: changes reach other processes after that
+API_KEY_LOCAL_CACHE_SIZE = env.int('API_KEY_LOCAL_CACHE_SIZE', default=4096)
+API_KEY_LOCAL_CACHE_TTL = env.int('API_KEY_LOCAL_CACHE_TTL', default=5)
+# Sign in and sign up also hand out signed access tokens, verified without any lookup, valid for this many seconds
+ACCESS_TOKEN_ENABLED = env.bool('ACCESS_TOKEN_ENABLED', default=False)
+ACCESS_TOKEN_LIFETIME = env.int('ACCESS_TOKEN_LIFETIME', default=900)
+# Seconds each process reuses revocation checks: sign outs reach other processes after that
+ACCESS_TOKEN_REVOCATION_LOCAL_TTL = env.int('ACCESS_TOKEN_REVOCATION_LOCAL_TTL', default=5)
+
+# PASSWORD HASHING
+# ------------------------------------------------------------------------------
+# Threads hashing passwords in each process, 0 for one per core. Sign ins and sign ups are answered 503 while more
+# hashes than PASSWORD_HASHING_MAX_PENDING are running or queued, 0 for four per thread
+PASSWORD_HASHING_WORKERS = env.int('PASSWORD_HASHING_WORKERS', default=0)
+PASSWORD_HASHING_MAX_PENDING = env.int('PASSWORD_HASHING_MAX_PENDING', default=0)
+
+# THROTTLING
+# ------------------------------------------------------------------------------
+# Requests a client may send per sliding window, by resource name and by '<resource name>.<url name>' for single
+# endpoints. Clients are counted by user once authenticated, by address otherwise
+THROTTLE_RATES = {
+    'tasks': '300/minute',
+    'tasks.api_get_tasks': '120/minute',
+    'tasks.api_get_task_feed': '30/minute',
+    'userprofile': '60/minute',
+    'userprofile.api_upload_profile_image': '10/minute',
+}
+# Counts every process keeps on its own, production counts in Redis
+THROTTLE_BACKEND = env('THROTTLE_BACKEND', default='backend.commons.throttle.MemoryBackend')
+
+# TASK LISTING CACHE
+# ------------------------------------------------------------------------------
+# Seconds a rendered /tasks/listing/ page stays cached, writes invalidate it earlier
+TASK_LISTING_CACHE_TIMEOUT = env.int('TASK_LISTING_CACHE_TIMEOUT', default=300)
+# Serve the previous page to concurrent readers while one request re-renders it
+TASK_LISTING_CACHE_SERVE_STALE = env.bool('TASK_LISTING_CACHE_SERVE_STALE', default=True)
+TASK_LISTING_CACHE_STALE_TIMEOUT = env.int('TASK_LISTING_CACHE_STALE_TIMEOUT', default=3600)
+# Seconds the /tasks/calendar/ counts of past days stay cached, writes invalidate them earlier
+TASK_CALENDAR_CACHE_TIMEOUT = env.int('TASK_CALENDAR_CACHE_TIMEOUT', default=86400)
+# Seconds the per day, month and user version counters of the caches above live, an expired one just drops the
+# pages cached under it
+TASK_CACHE_VERSION_TIMEOUT = env.int('TASK_CACHE_VERSION_TIMEOUT', default=7 * 86400)
+
+# TASK FEED
+# ------------------------------------------------------------------------------
+# Days before and after today the /tasks/feed.ics iCalendar feed holds tasks of
+TASK_FEED_PAST_DAYS = env.int('TASK_FEED_PAST_DAYS', default=30)
+TASK_FEED_FUTURE_DAYS = env.int('TASK_FEED_FUTURE_DAYS', default=365)
+# Seconds a rendered feed stays cached, writes invalidate it earlier. Bigger feeds are streamed but not cached
+TASK_FEED_CACHE_TIMEOUT = env.int('TASK_FEED_CACHE_TIMEOUT', default=86400)
+TASK_FEED_CACHE_MAX_SIZE = env.int('TASK_FEED_CACHE_MAX_SIZE', default=1024 * 1024)
+
+# TASK REMINDERS
+# ------------------------------------------------------------------------------
+# Minutes before a task starts its reminder fires, and hour of the reminders of tasks without a time
+TASK_REMINDER_LEAD_MINUTES = env.int('TASK_REMINDER_LEAD_MINUTES', default=0)
+TASK_REMINDER_DAY_HOUR = env.int('TASK_REMINDER_DAY_HOUR', default=9)
+# Reminders sent per batch, and jobs sharing the reminders due every minute
+TASK_REMINDER_BATCH_SIZE = env.int('TASK_REMINDER_BATCH_SIZE', default=1000)
+TASK_REMINDER_WORKERS = env.int('TASK_REMINDER_WORKERS', default=4)
+# Class sending the reminders, see backend.task.reminders
+TASK_REMINDER_SENDER = env('TASK_REMINDER_SENDER', default='backend.task.reminders.LoggingSender')
+
+# TASK PARTITIONS
+# ------------------------------------------------------------------------------
+# Months after the current one whose task partition is created ahead, by a daily job
+TASK_PARTITION_MONTHS_AHEAD = env.int('TASK_PARTITION_MONTHS_AHEAD', default=3)
+# Detach the partitions of months older than this, 0 keeps them all. Repeating tasks of detached months stop showing
+TASK_PARTITION_ARCHIVE_MONTHS = env.int('TASK_PARTITION_ARCHIVE_MONTHS', default=0)
+
+# TASK TRASH
+# ------------------------------------------------------------------------------
+# Days deleted tasks stay in the trash, and sync tokens stay valid, before they are purged for good
+TASK_TRASH_RETENTION_DAYS = env.int('TASK_TRASH_RETENTION_DAYS', default=30)
+# Tasks purged per transaction, and seconds between transactions so replicas keep up
+TASK_TRASH_PURGE_BATCH_SIZE = env.int('TASK_TRASH_PURGE_BATCH_SIZE', default=500)
+TASK_TRASH_PURGE_PAUSE = env.float('TASK_TRASH_PURGE_PAUSE', default=0.1)
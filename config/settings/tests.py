@@ -60,3 +60,8 @@ TEMPLATES[0]['OPTIONS']['loaders'] = [
         'django.template.loaders.app_directories.Loader',
     ]),
 ]
+
+# TASK REMINDERS
+# ------------------------------------------------------------------------------
+# Reminders are kept in backend.task.reminders.LocmemSender.outbox
+TASK_REMINDER_SENDER = 'backend.task.reminders.LocmemSender'